@@ -161,6 +161,8 @@ class Life:
                     curtimezone = [curtimezone,line[1:]]
                 elif line[0]=="@":
                     self.parseMeta(line[1:],curdate)
+                elif line[0]==">":
+                    curday.add_note(line[1:].strip())
                 else:
                     splited = line.split(":")
                     dates = splited[0]
@@ -746,7 +748,7 @@ class Span:
         if x<0:
             day = yesterday(self.day)
             x=x+60*24            
-        elif x>(60*24):
+        elif x>=(60*24):
             day = tomorrow(self.day)
             x=x-60*24
         else:
@@ -762,7 +764,7 @@ class Span:
         if x<0:
             day = yesterday(self.day)
             x=x+60*24            
-        elif x>(60*24):
+        elif x>=(60*24):
             day = tomorrow(self.day)
             x=x-60*24
         else:
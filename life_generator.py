@@ -1,63 +1,123 @@
 import argparse
-from datetime import datetime
-from random import randrange, sample
+from datetime import datetime, timedelta
 import sys
 import life.life as life 
 
-import argparse, json
+import argparse, json, time, copy
+from concurrent.futures import ProcessPoolExecutor
 from os.path import expanduser, isfile, join
-from os import rename
+from os import makedirs, rename, remove
+import shutil
 import csv
+import numpy as np
 
+from utils.sampling import AliasSampler
 from utils.utils import update_dict
 from utils.default_config import CONFIG
 
 MAX_MINS_PER_DAY = 1440
+MILITARY_TIMES = [life.minutes_to_military(minutes) for minutes in range(MAX_MINS_PER_DAY)] # military time of each minute of the day
+WRITE_BUFFER_SIZE = 1 << 20 # size of the generated file's write buffer (in bytes)
 FAIL_COLOR = '\033[91m'
 END_COLOR = '\033[0m'
 
-def pairwise(iterable):
-    a = iter(iterable)
-    return zip(a, a)
+PROFILES = { # settings of the workload profiles, selected with the profile setting (or --profile)
+    'uniform': {
+        'zipf_exponent': 0, # popularity of the places: the n-th place of the CSV file is drawn with weight 1 / n^zipf_exponent (0 for uniform)
+        'routine': 0, # share of days that start and end at home (the first place), with the middle span at work (the second place) on weekdays
+        'trips': 0, # share of days with an indoor trip (`a->b` span) from the place before it to the place after it
+        'timezone_trips': 0, # share of days that start a trip of up to MAX_TRIP_DAYS days to another timezone
+        'coordinates': 0, # share of places with known coordinates (within the configuration's bounds)
+        'categories': 0, # share of places with a category
+        'subplaces': 0, # share of places with a subplace, where half of the place's spans are spent
+        'nameswaps': 0, # share of days on which a place changes its name
+        'tags': 0, # share of spans with tags and semantics
+        'include': False # if True, the meta commands about the places are written to a file included by the generated files
+    },
+    'realistic': {
+        'zipf_exponent': 1.1,
+        'routine': 0.8,
+        'trips': 0.1,
+        'timezone_trips': 0.02,
+        'coordinates': 0.2,
+        'categories': 0.3,
+        'subplaces': 0.1,
+        'nameswaps': 0.001,
+        'tags': 0.2,
+        'include': True
+    }
+}
+TAGS = ['family', 'friends', 'colleagues', 'sport']
+SEMANTICS = ['meal', 'meeting', 'shopping', 'leisure']
+CATEGORIES = ['restaurant', 'shop', 'office', 'park', 'gym']
+MAX_TRIP_DAYS = 7 # max number of days of a trip to another timezone
+MAX_TIMEZONE_OFFSET = 12 # max offset (in hours) of the timezones of the trips
+META_DIR = 'meta' # directory (in the output directory) of the files with the meta commands included by the generated files, kept apart so the converter doesn't read them as LIFE files
 
-parser = argparse.ArgumentParser(description='')
-parser.add_argument('--config', '-c', dest='config', metavar='c', type=str,
-        help='configuration file')
-parser.add_argument('--n_days', '-n', dest='n_days', metavar='n', type=int,
-        help='number of days to generate')
-parser.add_argument('--max_spans', '-s', dest='max_spans', metavar='s', type=int,
-        help='max number of spans per day')
-parser.add_argument('--date', '-d', dest='date', metavar='d', type=str,
-        help='start date (YYYY-MM-DD)')
-parser.add_argument('--output', '-o', dest='output', metavar='o', type=str,
-        help='output file name')
-args = parser.parse_args()
+def generate_shard(config, n_days, max_spans, start_date, seed, meta_file, first, last, path):
+    """ Generates a shard of the days in a worker process (see `LIFEGenerator.generate_shards`)
+    Args:
+        config (:obj:`dict`): generator's configuration
+        n_days (int): number of days of the whole corpus
+        max_spans (int): max number of spans per day
+        start_date (str): date of the corpus' first day (`YYYY-MM-DD`)
+        seed (int): seed of the corpus
+        meta_file (str): name of the file with the meta commands about the places (None if they're in the header)
+        first (int): index of the shard's first day
+        last (int): index of the day after the shard's last day
+        path (str): path of the shard's file
+    Returns:
+        float: seconds spent generating the shard
+    """
+    generator = LIFEGenerator(config, n_days, max_spans, start_date, seed)
+    generator.meta_file = meta_file
 
+    with open(path, "w", buffering=WRITE_BUFFER_SIZE) as file:
+        return generator.write(file, first, last)
 
 class LIFEGenerator(object):
     """ 
-    Generates a random LIFE file to generate data
+    Generates random LIFE data, as a LIFE file or streamed (as LIFE content, lines or life.Day objects) without touching disk
     """
 
-    def __init__(self, config_file, n_days, max_spans, start_date, output):
-        self.config = dict(CONFIG)
-        if config_file and isfile(expanduser(config_file)):
+    def __init__(self, config_file=None, n_days=None, max_spans=None, start_date=None, seed=None, profile=None):
+        """
+            Args:
+                config_file (str or :obj:`dict`): path of the configuration file, or the configuration (updating the default one)
+                n_days (int): number of days to generate (100 by omission)
+                max_spans (int): max number of spans per day (10 by omission)
+                start_date (str): date of the first day (`YYYY-MM-DD`, current day by omission)
+                seed (int): when set, each batch of days is drawn from a generator seeded with it and the batch's number, so the 
+                same seed always generates the same days, however they're split into shards (random by omission)
+                profile (str): workload profile (see PROFILES), the configuration's profile by omission
+        """
+        self.config = copy.deepcopy(CONFIG)
+        if isinstance(config_file, dict):
+            update_dict(self.config, config_file)
+        elif config_file and isfile(expanduser(config_file)):
             with open(expanduser(config_file), 'r') as config_file:
                 config = json.loads(config_file.read())
                 update_dict(self.config, config)
 
+        if profile != None:
+            self.config['life_generator']['profile'] = profile
+
         self.n_days = n_days if n_days != None else 100
         self.max_spans = max_spans if max_spans != None else 10
         self.locations = []
-        self.header = ''
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
         
         date = datetime.strptime(start_date, '%Y-%m-%d') if start_date != None else datetime.now()
-        self.cur_date = str(date.date()).replace('-','_')
+        self.start_date = date.date()
+        self.cur_date = self.start_date
+        self.meta_file = None
 
-        output_file = output if output != None else "generated_life"
+        profile = self.config['life_generator']['profile']
+        self.profile = dict(PROFILES['uniform'], **(PROFILES[profile] if isinstance(profile, str) else profile))
 
         self.get_locations()
-        self.generate_file(output_file)
+        self.plan_places()
 
     def get_locations(self):
         """
@@ -66,80 +126,445 @@ class LIFEGenerator(object):
         locations_csv = join(expanduser(self.config['life_generator']['locations_csv']))
 
         if isfile(locations_csv):
-            with open('input\generator\locations.csv','r') as csvfile: 
+            with open(locations_csv, 'r') as csvfile: 
                 reader = csv.reader(csvfile, delimiter=',', quotechar='|') 
                 for row in reader:
                     self.locations += row
         else:
             sys.exit(f"{FAIL_COLOR}Please provide a CSV file with location names.{END_COLOR}")
 
+    def plan_places(self):
+        """
+            Plans the places of the profile: the popularity of the CSV file's places, their subplaces and name changes, and the 
+            meta commands about them. With a seed, they're drawn from a random generator of their own, so they're the same in 
+            every shard
+        """
+
+        profile = self.profile
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(0,))) if self.seed != None else self.rng
+        n_places = len(self.locations)
+
+        self.names = list(self.locations) # names of the places, followed by the names of the subplaces and of the renamed places
+        self.sampler = AliasSampler(1 / np.arange(1, n_places + 1) ** profile['zipf_exponent']) if profile['zipf_exponent'] > 0 else None
+        self.subplace_of = np.full(n_places, -1)
+        self.nameswaps = []
+        self.meta = []
+
+        for place in np.flatnonzero(rng.random(n_places) < profile['subplaces']).tolist():
+            self.subplace_of[place] = len(self.names)
+            self.names.append(f'{self.locations[place]} room')
+            self.meta.append(f'@{self.names[-1]}<{self.locations[place]}')
+
+        for place in np.flatnonzero(rng.random(n_places) < profile['categories']).tolist():
+            self.meta.append(f'@{self.locations[place]}: {CATEGORIES[rng.integers(len(CATEGORIES))]}')
+
+        bounds = self.config['bounds']
+        lats = sorted([bounds['point1']['lat'], bounds['point2']['lat']])
+        lngs = sorted([bounds['point1']['lng'], bounds['point2']['lng']])
+
+        for place in np.flatnonzero(rng.random(n_places) < profile['coordinates']).tolist():
+            self.meta.append(f'@{self.locations[place]} @ {rng.uniform(*lats):.6f}, {rng.uniform(*lngs):.6f}')
+
+        # each renamed place changes its name once, on a random day, and is called by its new name from then on
+        n_swaps = min(rng.binomial(self.n_days, profile['nameswaps']), n_places)
+        days = np.sort(rng.choice(self.n_days, n_swaps, replace=False)).tolist()
+
+        for day, place in zip(days, rng.choice(n_places, n_swaps, replace=False).tolist()):
+            self.nameswaps.append((day, place, len(self.names)))
+            self.names.append(f'new {self.locations[place]}')
+
     def get_header(self):
         """
-            Appends the header file with meta commands to the top of the generated LIFE file
+            Reads the header file with meta commands that is placed at the top of the generated LIFE data, followed by the 
+            profile's meta commands about the places (or the command that includes the file they're written to)
+            Returns:
+                str: the header ('' if no header file is provided and there are no meta commands)
+        """
+
+        header = ''
+        header_path = self.config['life_generator']['header_path']
+
+        if header_path and isfile(expanduser(header_path)):
+            with open(expanduser(header_path), 'r') as header_file:
+                header = header_file.read() + '\n'
+
+        if self.meta and self.meta_file:
+            header += f'@include "{self.meta_file}"\n\n'
+        elif self.meta:
+            header += '\n'.join(self.meta) + '\n\n'
+
+        return header
+
+    def write_meta(self, file_name):
+        """
+            Writes the meta commands about the places to a file of their own (`meta/<file_name>_meta.life`, in lowercase), 
+            included by the generated LIFE files, if the profile includes them. The file is written to a directory of its own, so 
+            the output directory can be used as the converter's input directory
+            Args:
+                file_name (str): defines the name of the generated file 
+        """
+
+        if self.profile['include'] and self.meta:
+            self.meta_file = f'{META_DIR}/{file_name}_meta.life'.lower() # included files are read in lowercase
+            makedirs(join(expanduser(self.config['life_generator']['output_path']), META_DIR), exist_ok=True)
+
+            with open(join(expanduser(self.config['life_generator']['output_path']), self.meta_file), 'w') as meta_file:
+                meta_file.write('\n'.join(self.meta) + '\n')
+
+    def generate(self, first=0, last=None):
+        """
+            Generates the LIFE data: the header, followed by the days, in batches of `batch_days` days (see `generate_days`). 
+            Each call generates new random days (unless a seed is set)
+            Args:
+                first (int): index of the first day to generate (the first day of a batch)
+                last (int): index of the day after the last day to generate (all of them by omission)
+            Yields:
+                str: LIFE content (the header, then a batch of days at a time)
+        """
+
+        last = self.n_days if last == None else last
+        self.cur_date = self.start_date + timedelta(days=first)
+        header = self.get_header()
+
+        if header:
+            yield header
+
+        batch_days = self.config['life_generator']['batch_days']
+
+        for batch_first in range(first, last, batch_days):
+            if self.seed != None:
+                self.rng = np.random.default_rng([self.seed, batch_first // batch_days])
+
+            yield self.generate_days(min(batch_days, last - batch_first))
+
+    def lines(self):
+        """
+            Yields:
+                str: lines of the generated LIFE data (ending with a newline)
+        """
+        for content in self.generate():
+            yield from content.splitlines(keepends=True)
+
+    def days(self):
+        """
+            Parses the generated days as they're generated. The header's meta commands are kept by the life.Life object the days
+            are parsed by
+            Yields:
+                :obj:`life.Day`: each generated day
+        """
+        parsed = life.Life()
+
+        for content in self.generate():
+            parsed.from_string(content)
+            yield from parsed.days
+            parsed.days = []
+
+    def life(self):
         """
+            Returns:
+                :obj:`life.Life`: the generated LIFE data, parsed without writing it to a file
+        """
+        parsed = life.Life()
+        parsed.from_string(self.lines())
+
+        return parsed
+
+    def write(self, file, first=0, last=None):
+        """
+            Writes the generated LIFE data to a file
+            Args:
+                file (:obj:`io.TextIOBase`): file (or stdout) the data is written to
+                first (int): index of the first day to write (the first day of a batch)
+                last (int): index of the day after the last day to write (all of them by omission)
+            Returns:
+                float: seconds spent generating and writing the data
+        """
+
+        start = time.perf_counter()
+
+        for content in self.generate(first, last):
+            file.write(content)
 
-        header_path = join(expanduser(self.config['life_generator']['header_path']))
+        file.flush()
 
-        if isfile(header_path):
-            header = open(header_path, 'r').read()
-            self.file.write(header + '\n')            
+        return time.perf_counter() - start
+
+    def report(self, elapsed, shards=1):
+        """
+            Args:
+                elapsed (float): seconds spent generating the days
+                shards (int): number of shards the days were generated in
+            Returns:
+                str: number of days generated, and per second
+        """
+        return (f"Generated {self.n_days} days in {elapsed:.2f}s ({self.n_days / elapsed if elapsed > 0 else 0:.0f} days/s)"
+            f"{f' in {shards} shards' if shards > 1 else ''}.")
 
     def generate_file(self, file_name):
         """
-            Creates file with the provided path and file name with the generated LIFE days
+            Creates file with the provided path and file name with the generated LIFE days, written through a large buffer
             Args:
                 file_name (str): defines the name of the generated file 
         """
 
-        self.file = open(join(expanduser(self.config['life_generator']['output_path']), file_name + '.life'), "w")
+        self.write_meta(file_name)
 
-        # adds header with meta commands to file (if header file is provided)
-        self.get_header()
-        
-        for i in range(self.n_days):
-            self.generate_day()
-            self.cur_date = life.tomorrow(self.cur_date)
-        
-        self.file.close()
+        with open(join(expanduser(self.config['life_generator']['output_path']), file_name + '.life'), "w", buffering=WRITE_BUFFER_SIZE) as file:
+            print(self.report(self.write(file)))
+
+        self.meta_file = None # streamed data keeps the meta commands in its header
 
-    def generate_day(self):
+    def generate_shards(self, file_name, shards, concat=False):
         """
-            Generates a day in the LIFE fromat
+            Splits the days into consecutive shards, generated in parallel by worker processes, each written to a LIFE file of its
+            own (`<file_name>_<shard>.life`, with the header). The days are split by batch, so with a seed the shards hold the 
+            same days they would hold in a single file
+            Args:
+                file_name (str): defines the name of the generated file 
+                shards (int): number of shards (and worker processes)
+                concat (bool): if True, shards are concatenated in order into a single file (`<file_name>.life`) and removed
         """
-        day = [f'--{self.cur_date}', '\n']
-        times = self.generate_times_for_spans()
-        
-        # iterates through pairs of times that will compose a span
-        for start, end in pairwise(times):
-            # attributes a random location to a span
-            day.append(f'{start}-{end}: {self.locations[randrange(0, len(self.locations) - 1)]}') 
-            day.append('\n')
 
-        day.append('\n')
+        start = time.perf_counter()
+
+        if self.seed == None:
+            # shards are generated with the same seed, so they plan the same places
+            self.seed = int(np.random.SeedSequence().entropy)
+            self.plan_places()
+
+        self.write_meta(file_name)
+        output_path = expanduser(self.config['life_generator']['output_path'])
+        batch_days = self.config['life_generator']['batch_days']
+        n_batches = -(-self.n_days // batch_days)
+
+        # first day of each shard, shards without any batch are left out
+        bounds = sorted(set([min(n_batches * shard // shards * batch_days, self.n_days) for shard in range(shards + 1)]))
+        paths = [join(output_path, f'{file_name}_{shard:03d}.life') for shard in range(len(bounds) - 1)]
+
+        with ProcessPoolExecutor(max(len(paths), 1)) as executor:
+            generated = [executor.submit(generate_shard, self.config, self.n_days, self.max_spans, self.start_date.isoformat(), 
+                self.seed, self.meta_file, first, last, path) for first, last, path in zip(bounds, bounds[1:], paths)]
+            [shard.result() for shard in generated]
+
+        if concat:
+            header_size = len(self.get_header().encode())
 
-        # writes day in LIFE file
-        self.file.writelines(day)
+            with open(join(output_path, file_name + '.life'), 'wb') as file:
+                for shard, path in enumerate(paths):
+                    with open(path, 'rb') as shard_file:
+                        shard_file.seek(header_size if shard > 0 else 0) # the header is only kept once
+                        shutil.copyfileobj(shard_file, file, WRITE_BUFFER_SIZE)
 
-    def generate_times_for_spans(self):
+                    remove(path)
+
+        self.meta_file = None
+        print(self.report(time.perf_counter() - start, len(paths)))
+
+    def generate_days(self, n_days):
         """
-            Generates the times that will be used to create the spans in a LIFE day (including 00:00 and 23:59)
+            Generates consecutive days in the LIFE format, starting at the current date. The span times and locations of all of 
+            the days are drawn at once
+            Args:
+                n_days (int): number of days to generate
+            Returns:
+                str: the days, in the LIFE format
         """
-        start_end_times = ['0000', '2359']
-        
+        first_day = (self.cur_date - self.start_date).days
+        times, n_spans = self.generate_times_for_spans(n_days)
+        places, trips, timezones = self.generate_places(first_day, times, n_spans)
+        spans = np.arange(times.shape[1] // 2) < n_spans[:, None]
+        starts = times[:, 0::2][spans].tolist()
+        ends = times[:, 1::2][spans].tolist()
+        labels = [self.names[place] for place in places[spans].tolist()]
+        first_spans = (np.cumsum(n_spans) - n_spans).tolist() # index of each day's first span
+
+        for day, span, origin, destination in trips:
+            labels[first_spans[day] + span] = f'{self.names[origin]}->{self.names[destination]}'
+
+        if self.profile['tags'] > 0:
+            tagged = np.flatnonzero(self.rng.random(len(labels)) < self.profile['tags'])
+            tags = self.rng.integers(0, len(TAGS), len(tagged)).tolist()
+            semantics = self.rng.integers(0, len(SEMANTICS), len(tagged)).tolist()
+
+            for span, tag, semantic in zip(tagged.tolist(), tags, semantics):
+                labels[span] += f' [{TAGS[tag]}] {{{SEMANTICS[semantic]}}}'
+
+        # pairs of times that compose each span of each day, with its location
+        lines = [f'{MILITARY_TIMES[start]}-{MILITARY_TIMES[end]}: {label}\n' for start, end, label in zip(starts, ends, labels)]
+
+        # timezones change during the span that follows them
+        for day, span, timezone in timezones:
+            lines[first_spans[day] + span] = f'@{timezone}\n' + lines[first_spans[day] + span]
+
+        meta = {}
+
+        for day, place, new_place in self.nameswaps:
+            if first_day <= day < first_day + n_days:
+                meta[day - first_day] = meta.get(day - first_day, '') + f'@{self.names[place]}>>{self.names[new_place]}\n'
+
+        dates = np.arange(np.datetime64(self.cur_date), np.datetime64(self.cur_date) + n_days).astype(str).tolist()
+        ends = np.cumsum(n_spans).tolist()
+        days = []
+
+        for day, (date, start, end) in enumerate(zip(dates, [0] + ends, ends)):
+            days.append(f'--{date.replace("-", "_")}\n{meta.get(day, "")}{"".join(lines[start:end])}\n')
+
+        self.cur_date += timedelta(days=n_days)
+
+        return ''.join(days)
+
+    def generate_places(self, first_day, times, n_spans):
+        """
+            Draws the places of the spans of several days, following the profile: the places' popularity, home and work 
+            routines, subplaces, name changes, indoor trips and trips to other timezones
+            Args:
+                first_day (int): index of the first day
+                times (:obj:`numpy.ndarray`): sorted minutes of the day of each day's times (see `generate_times_for_spans`)
+                n_spans (:obj:`numpy.ndarray`): number of spans of each day
+            Returns:
+                tuple: place of each span (:obj:`numpy.ndarray`, indexes of `names`, a row per day), the indoor trips (day, span, 
+                origin and destination) and the timezone changes (day, span before which the timezone changes and timezone)
+        """
+
+        profile = self.profile
+        n_days = len(n_spans)
+        days = np.arange(n_days)
+
+        if self.sampler != None:
+            places = self.sampler.sample(self.rng, (n_days, times.shape[1] // 2))
+        else:
+            places = self.rng.integers(0, len(self.locations), (n_days, times.shape[1] // 2))
+
+        timezones, away = self.plan_timezone_trips(times, n_spans) if profile['timezone_trips'] > 0 else ([], np.zeros(n_days, dtype=bool))
+
+        if profile['routine'] > 0:
+            routine = (self.rng.random(n_days) < profile['routine']) & ~away
+            places[routine, 0] = 0
+            places[days[routine], n_spans[routine] - 1] = 0
+
+            # days of the week, from Monday (0), 1970-01-01 was a Thursday
+            weekdays = (np.datetime64(self.cur_date).astype(int) + days + 3) % 7
+            working = routine & (weekdays < 5) & (n_spans >= 3)
+            places[days[working], n_spans[working] // 2] = min(1, len(self.locations) - 1)
+
+        if (self.subplace_of >= 0).any():
+            subplaces = self.subplace_of[places]
+            moved = (subplaces >= 0) & (self.rng.random(places.shape) < 0.5)
+            places[moved] = subplaces[moved]
+
+        for day, place, new_place in self.nameswaps:
+            if day < first_day + n_days:
+                places[(first_day + days >= day)[:, None] & (places == place)] = new_place
+
+        # indoor trips, and the spans during which the timezone changes
+        trip_days = np.zeros(0, dtype=int)
+        trip_spans = np.zeros(0, dtype=int)
+
+        if profile['trips'] > 0:
+            changes = np.zeros(n_days, dtype=bool)
+            changes[[day for day, span, timezone in timezones]] = True
+            trip_days = np.flatnonzero((self.rng.random(n_days) < profile['trips']) & ~changes)
+            trip_spans = self.rng.integers(1, n_spans[trip_days]) if len(trip_days) > 0 else trip_spans
+
+        trip_days = np.concatenate((trip_days, np.array([day for day, span, timezone in timezones], dtype=int)))
+        trip_spans = np.concatenate((trip_spans, np.array([span for day, span, timezone in timezones], dtype=int)))
+        origins = places[trip_days, trip_spans - 1]
+        destinations = places[trip_days, np.minimum(trip_spans + 1, n_spans[trip_days] - 1)]
+        trips = [trip for trip in zip(trip_days.tolist(), trip_spans.tolist(), origins.tolist(), destinations.tolist()) if trip[2] != trip[3]]
+
+        return places, trips, timezones
+
+    def plan_timezone_trips(self, times, n_spans):
+        """
+            Plans trips to other timezones, of up to MAX_TRIP_DAYS days, that return within the days (so every batch of days 
+            starts and ends in the same timezone). The timezone changes during a span of the first and last day of the trip, and 
+            the offset is limited by the length of those spans, so time keeps going forward in UTC
+            Args:
+                times (:obj:`numpy.ndarray`): sorted minutes of the day of each day's times (see `generate_times_for_spans`)
+                n_spans (:obj:`numpy.ndarray`): number of spans of each day
+            Returns:
+                tuple: timezone changes (day, span before which the timezone changes and timezone) and whether each day is 
+                (at least partly) spent away (:obj:`numpy.ndarray`)
+        """
+
+        n_days = len(n_spans)
+        lengths = times[:, 1::2] - times[:, 0::2]
+        changes = []
+        away = np.zeros(n_days, dtype=bool)
+
+        for day in np.flatnonzero(self.rng.random(n_days) < self.profile['timezone_trips']).tolist():
+            back = day + int(self.rng.integers(1, MAX_TRIP_DAYS + 1))
+
+            if away[day] or back >= n_days:
+                continue
+
+            leave_span = int(self.rng.integers(1, n_spans[day]))
+            back_span = int(self.rng.integers(1, n_spans[back]))
+            offsets = [offset for offset in range(-min((lengths[back, back_span] - 1) // 60, MAX_TIMEZONE_OFFSET), 
+                min((lengths[day, leave_span] - 1) // 60, MAX_TIMEZONE_OFFSET) + 1) if offset != 0]
+
+            if offsets:
+                changes += [(day, leave_span, life.timezone_from_offset(offsets[self.rng.integers(len(offsets))])), (back, back_span, 'UTC')]
+                away[day:back + 1] = True
+
+        return changes, away
+
+    def generate_times_for_spans(self, n_days):
+        """
+            Generates the times that will be used to create the spans of several LIFE days (including 00:00 and 23:59)
+            Args:
+                n_days (int): number of days
+            Returns:
+                tuple: sorted minutes of the day of each day's times (:obj:`numpy.ndarray`, a row per day, padded at the end) and 
+                number of spans of each day (:obj:`numpy.ndarray`)
+        """
+
         # the max times to generate is half the max num of spans (spans have 2 start and end times) minus the start and end of day times we already know
         max_times = max(self.max_spans * 2, 2)
 
-        # calculates even random number of times to generate  
-        n_times = max(randrange(0, max_times, 2), 2)
-        
-        # generates n_times of times to use in spans
-        times = sample(range(0, MAX_MINS_PER_DAY), n_times)
+        # calculates even random number of times to generate for each day
+        n_times = np.maximum(self.rng.integers(0, max_times // 2, n_days) * 2, 2)
+        width = int(n_times.max())
+        unused = np.arange(width) >= n_times[:, None]
 
-        # converts minutes in day to military time
-        military_times = list(map(lambda mins: life.minutes_to_military(mins), times))
-        
-        # return all times in military format that will compose the spans of a day
-        return sorted(military_times + start_end_times)
+        # generates n_times of distinct times for each day: the minutes with the lowest of a random key each (a random sample 
+        # without replacement of each day's minutes)
+        minutes = np.argpartition(self.rng.random((n_days, MAX_MINS_PER_DAY)), width - 1, axis=1)[:, :width]
+        minutes[unused] = MAX_MINS_PER_DAY + np.nonzero(unused)[1] # unused times are sorted after the end of the day
+
+        start_end_times = np.tile([0, MAX_MINS_PER_DAY - 1], (n_days, 1))
+
+        # return all times that will compose the spans of each day
+        return np.sort(np.hstack((start_end_times, minutes)), axis=1), (n_times + 2) // 2
 
 if __name__=="__main__":
-    LIFEGenerator(args.config, args.n_days, args.max_spans, args.date, args.output)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument('--config', '-c', dest='config', metavar='c', type=str,
+            help='configuration file')
+    parser.add_argument('--n_days', '-n', dest='n_days', metavar='n', type=int,
+            help='number of days to generate')
+    parser.add_argument('--max_spans', '-s', dest='max_spans', metavar='s', type=int,
+            help='max number of spans per day')
+    parser.add_argument('--date', '-d', dest='date', metavar='d', type=str,
+            help='start date (YYYY-MM-DD)')
+    parser.add_argument('--output', '-o', dest='output', metavar='o', type=str,
+            help='output file name (- writes to stdout)')
+    parser.add_argument('--shards', '-S', dest='shards', metavar='S', type=int,
+            help='number of shards generated in parallel, each to a file of its own')
+    parser.add_argument('--seed', '-r', dest='seed', metavar='r', type=int,
+            help='random seed, the same seed always generates the same days')
+    parser.add_argument('--concat', '-C', dest='concat', action='store_true',
+            help='concatenate the shards into a single file')
+    parser.add_argument('--profile', '-p', dest='profile', metavar='p', type=str, choices=list(PROFILES),
+            help='workload profile (uniform or realistic)')
+    args = parser.parse_args()
+
+    generator = LIFEGenerator(args.config, args.n_days, args.max_spans, args.date, args.seed, args.profile)
+    output = args.output if args.output != None else "generated_life"
+
+    if output == '-':
+        print(generator.report(generator.write(sys.stdout)), file=sys.stderr)
+    elif args.shards != None and args.shards > 1:
+        generator.generate_shards(output, args.shards, args.concat)
+    else:
+        generator.generate_file(output)
\ No newline at end of file
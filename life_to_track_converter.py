@@ -1,60 +1,505 @@
-import requests, random, os, polyline, argparse, json
-from urllib.parse import urlencode
+import random, os, argparse, io, json, time, hashlib, copy, signal
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 
-from datetime import datetime, timedelta
-from math import radians, cos, sin, asin, sqrt
+from datetime import datetime
+from math import ceil
+import numpy as np
 from os.path import expanduser, isfile, join
 from os import rename
 
-from utils.bounds import EARTH_RADIUS, bounding_locations, bounds_intersection, coords_obj, is_point_in_bounds
+from utils.bounds import bounding_boxes, bounding_locations, bounds_to_box, boxes_intersection, coords_obj, points_in_boxes
 from life.life import Life
+from routing.batching import plan_requests, unique_legs
+from routing.backends import BACKENDS, api_key, create_backend
+from routing.fetcher import RouteFetcher
+from routing.scheduler import RequestScheduler
+from utils.route_cache import MemoryRouteCache, RouteCache
+from utils.route_geometry import freeze_route
+from utils.timestamps import parse_timestamp
+from utils.track_writers import TRACK_WRITERS
 from utils.utils import update_dict
 from utils.default_config import CONFIG
 
 FAIL_COLOR = '\033[91m'
 END_COLOR = '\033[0m'
 
-def indentation(n):
-    return ''.join('\t' for i in range(n))
+MANIFEST_FILE = 'manifest.json' # manifest of the converted days, in the output directory (incremental mode)
+WATCH_STATS_FILE = 'watch.json' # counters of the conversions in watch mode, in the output directory
+MANIFEST_CONFIG_KEYS = ['bounds', 'avg_speed', 'bounds_iterations', 'simplify_tolerance'] # settings that change the converted days
+SOLVER_CONFIG_KEYS = ['bounds', 'avg_speed', 'bounds_iterations'] # settings that change the solved coordinates
+
+worker = None
+
+def init_worker(config, backend):
+    """ Creates the converter used by a worker process to calculate routes in-process
+    Args:
+        config (:obj:`dict`): configuration used by the main process
+        backend (string): routing backend selected by the main process
+    """
+    global worker
+    worker = LIFEToTrackConverter(config, backend)
+
+def route_legs(group):
+    """ Calculates routes with an in-process routing backend in a worker process
+    Args:
+        group (:obj:`list` of :obj:`list` of :obj:`tuple`): origin and destination coordinates of the legs to route, by chain
+    Returns:
+        :obj:`tuple`: the route of each leg and the stats gathered while calculating them
+    """
+    before = worker.run_stats()
+    routes = [worker.backend.route(*leg) for chain in group for leg in chain]
+    after = worker.run_stats()
+
+    return routes, {source: {key: after[source][key] - before[source][key] for key in after[source]} for source in after}
+
+def render_track(output_format, track, segments):
+    """ Renders a day's routes in an output format (see `utils.track_writers.TrackWriter.render_segment`), the rendering 
+    stage of the conversion, run in a worker process. The rendered routes are sent back to the main process, which writes 
+    them (with a single worker, routes are streamed to the file instead, see `stream_track`)
+    Args:
+        output_format (string): format of the output files
+        track (string): name of the day's track (None if the day is written to a file of its own)
+        segments (:obj:`list` of :obj:`tuple`): geometry, start and end times (in seconds since the epoch) and speed of each of
+        the day's routes
+    Returns:
+        :obj:`tuple`: the rendered routes and the time spent rendering them (in seconds)
+    """
+    start = time.perf_counter()
+    track_writer = TRACK_WRITERS[output_format]
+    rendered = []
+
+    for geometry, start_epoch, end_epoch, speed in segments:
+        lats, lngs = geometry.coords()
+        times = geometry.timestamps(start_epoch, end_epoch, speed)
+        rendered.append(list(track_writer.render_segment(lats.tolist(), lngs.tolist(), times.tolist(), track)))
+
+    return rendered, time.perf_counter() - start
+
+def stream_track(writer, segments):
+    """ Renders a day's routes straight to the current track of a writer, a piece at a time, so the memory used doesn't depend
+    on the length of the routes
+    Args:
+        writer (:obj:`utils.track_writers.TrackWriter`): writer of the output file
+        segments (iterable): of :obj:`tuple`: geometry, start and end times (in seconds since the epoch) and speed of each of
+        the day's routes
+    """
+
+    for geometry, start_epoch, end_epoch, speed in segments:
+        lats, lngs = geometry.coords() # decoded only while the segment is written
+        writer.segment(lats.tolist(), lngs.tolist(), geometry.timestamps(start_epoch, end_epoch, speed).tolist())
+
+def interrupt(signum, frame):
+    """ Stops watch mode on SIGTERM as on SIGINT, so the worker processes are shut down and the reports printed
+    """
+    raise KeyboardInterrupt()
+
+def convert(life, config=None, backend=None, output_format='gpx'):
+    """ Converts a LIFE into tracks, without writing any file (see `LIFEToTrackConverter.convert`). A new converter is created for
+    each call; to keep the route caches and sessions warm between LIFE files, create a `LIFEToTrackConverter` and call its 
+    `convert` method instead
+    Args:
+        life (:obj:`life.Life` or string): LIFE object, or the content of a LIFE file
+        config (string or :obj:`dict`, optional): path of the configuration file, or the configuration
+        backend (string, optional): routing backend (tomtom, google, mock or local)
+        output_format (string): format of the tracks (gpx, gpx.gz, geojson or npz)
+    Returns:
+        iterator: of :obj:`tuple`: date and track of each day with routes
+    """
+    return LIFEToTrackConverter(config, backend, output_format).convert(life)
 
-parser = argparse.ArgumentParser(description='')
-parser.add_argument('--config', '-c', dest='config', metavar='c', type=str,
-        help='configuration file')
-parser.add_argument('--google', '-g', dest='use_google_maps_api', metavar='g', type=bool,
-        help='use google maps api')
-args = parser.parse_args()
 class LIFEToTrackConverter(object):
     """ 
         Convertes LIFE files into randomly generated GPX track files
     """
 
-    def __init__(self, config_file, use_google_maps_api=False):
-        self.config = dict(CONFIG)
-        if config_file and isfile(expanduser(config_file)):
+    def __init__(self, config_file=None, backend=None, output_format='gpx', split='day', incremental=False):
+        """ Loads the configuration and sets up the route caches and the routing backend. Nothing is converted until `convert` (or 
+        `convert_files`) is called, so a converter can be kept to convert several LIFE files with its caches and sessions warm
+        Args:
+            config_file (string or :obj:`dict`): path of the configuration file, or the configuration (updating the default one)
+            backend (string, optional): routing backend (tomtom, google, mock or local), selected from the API keys set if not set
+            output_format (string): format of the tracks (gpx, gpx.gz, geojson or npz)
+            split (string): how the files written by `convert_files` are split (per day, file or month)
+            incremental (bool): if True, `convert_files` only converts the days that changed since the last run
+        """
+        self.config = copy.deepcopy(CONFIG) # nested settings are updated in place, converters in a process don't share them
+        if isinstance(config_file, dict):
+            update_dict(self.config, config_file)
+        elif config_file and isfile(expanduser(config_file)):
             with open(expanduser(config_file), 'r') as config_file:
                 config = json.loads(config_file.read())
                 update_dict(self.config, config)
 
         self.get_bounds()
         
-        self.google_maps_api = use_google_maps_api
+        self.backend_name = backend
+        self.output_format = output_format
+        self.split = split
+        self.incremental = incremental
+        self.leg_stats = {'failed': 0}
+        self.simplify_stats = {'points': 0, 'kept': 0, 'dropped': 0}
+        self.output_stats = {'files': 0, 'points': 0, 'bytes': 0}
+        self.stage_stats = {'routing': 0, 'rendering': 0, 'writing': 0, 'waiting': 0}
+        self.workers = 1
+        self.executor = None
+        self.output = None
+        self.previous_tracks = {}
+        self.manifest = {}
+        self.day_hashes = {}
+        self.day_outputs = {}
+        self.incomplete = set()
+        self.solved_locations = {}
+        self.solved_stats = {'solved': 0, 'reused': 0}
+        self.watch_stats = {'files': 0, 'days': 0, 'failed': 0, 'quarantined': 0, 'latency': 0, 'max_latency': 0}
+        self.set_route_cache()
         self.set_api()
+        self.set_backends()
 
-        for life_file in os.listdir(self.config['input_path']):
-            self.life = Life()
-            self.life.from_file(os.path.join(self.config['input_path'], life_file))
-            self.days = self.life.days
-            self.routes = {}
-            self.locations = {}
+    def convert(self, life):
+        """ Converts a LIFE into tracks in the selected output format, without writing any file (or moving the LIFE file). Days are
+        converted as they are iterated, and the routes (and the routing sessions) are kept by the converter for the next calls
+        Args:
+            life (:obj:`life.Life` or string): LIFE object, or the content of a LIFE file
+        Yields:
+            :obj:`tuple`: date (`YYYY-MM-DD`) and track of each day with routes, in the selected output format (a string, or bytes 
+            for the gpx.gz and npz formats)
+        """
+
+        if isinstance(life, str):
+            content = life
+            life = Life()
+            life.from_string(content)
+
+        self.life = life
+        self.days = life.days
+        self.locations = {}
+
+        self.solve_locations()
+
+        for group, legs in self.route_groups([(self.locations, day) for day in self.days_with_routes()]):
+            self.prefetch_routes(legs)
 
-            print(f"Processing {life_file}...")
-            self.get_locations_max_distance()
-            self.calculate_location_coords()
-            self.LIFE_to_gpx()
+            for locations, day in group:
+                self.locations = locations
+                yield day.date.replace('_', '-'), self.to_track(day)
 
-            life_path = join(expanduser(self.config['input_path']), life_file)
-            output_path = join(expanduser(self.config['output_path']), life_file)
-            rename(life_path, output_path)
+        if self.route_cache:
+            self.route_cache.flush()
+
+    def convert_files(self, workers=1):
+        """ Converts every LIFE file in the input directory (see `convert_input`) and prints a report of the run
+        Args:
+            workers (int): number of worker processes
+        """
+
+        print(f"Using {BACKENDS[self.backend_name].title} to generate routes.")
+
+        start = time.perf_counter()
+        self.start_workers(workers)
+        n_days = self.convert_input(self.input_files())
+        self.stop_workers()
+
+        elapsed = time.perf_counter() - start
+        print(f"Converted {n_days} days in {elapsed:.2f}s ({n_days / elapsed if elapsed > 0 else 0:.2f} days/s).")
+        self.print_reports()
+
+    def watch(self, workers=1):
+        """ Converts the LIFE files in the input directory as they're added or changed, until interrupted. The input directory is
+        polled every `watch_interval` seconds, and files are converted once none of them changed since the previous poll (so
+        files that are still being written aren't read). The converter is kept between conversions, so routes, solved
+        coordinates, connections and worker processes are reused. Each file is only marked as converted once its conversion 
+        succeeds: files that fail are converted again on the next polls, up to `watch_retries` times, and then left alone until 
+        they change. After each conversion, the number of files and days converted and the latency of each file (from its last 
+        change to the end of its conversion) are printed and saved to `watch.json`, in the output directory
+        Args:
+            workers (int): number of worker processes
+        """
+
+        print(f"Using {BACKENDS[self.backend_name].title} to generate routes.")
+        print(f"Watching {self.config['input_path']} for LIFE files (every {self.config['watch_interval']}s).")
+
+        signal.signal(signal.SIGTERM, interrupt)
+        self.start_workers(workers)
+        previous = {}
+        converted = {} # signature of each file when it was last converted
+        failures = {} # signature of each file that failed to convert and number of times it failed with it
+
+        try:
+            while True:
+                current = {life_file: self.file_signature(life_file) for life_file in self.input_files()}
+                # files that failed `watch_retries` times are skipped until their signature changes
+                changed = [life_file for life_file, signature in current.items() if converted.get(life_file) != signature 
+                    and failures.get(life_file) != (signature, self.config['watch_retries'])]
+
+                if changed and current == previous:
+                    self.convert_changes(current, changed, converted, failures)
+
+                previous = current
+                time.sleep(self.config['watch_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_workers()
+
+        print(self.watch_report())
+        self.print_reports()
+
+    def convert_changes(self, current, changed, converted, failures):
+        """ Converts LIFE files in watch mode and updates the watch stats. A file that can't be read is reported and skipped, 
+        without stopping the conversion of the others, and if the conversion fails once the files were read, each file is 
+        converted on its own, so only the ones that fail are converted again
+        Args:
+            current (:obj:`dict`): signature of each file in the input directory (see `file_signature`)
+            changed (:obj:`list` of string): names of the files added or changed since they were last converted
+            converted (:obj:`dict`): signature of each file when it was last converted, updated with the files converted
+            failures (:obj:`dict`): signature of each file that failed to convert and number of times it failed with it, 
+            updated with the files that failed
+        """
+
+        stats = self.watch_stats
+        modified = {life_file: os.stat(join(self.config['input_path'], life_file)).st_mtime for life_file in changed}
+        failed = {}
+
+        # in incremental mode every file is read, so the days of unchanged files are kept in the files they share
+        batches = [list(current) if self.incremental else changed]
+
+        while batches:
+            life_files = batches.pop(0)
+
+            try:
+                stats['days'] += self.convert_input(life_files, failed)
+            except Exception as error:
+                if self.incremental or len(life_files) == 1:
+                    failed.update({life_file: error for life_file in life_files if life_file in changed})
+                else:
+                    batches += [[life_file] for life_file in life_files if life_file not in failed]
+
+        finished = time.time()
+
+        for life_file in changed:
+            if life_file in failed:
+                attempts = failures[life_file][1] + 1 if failures.get(life_file, (None,))[0] == current[life_file] else 1
+                failures[life_file] = (current[life_file], attempts)
+                stats['failed'] += 1
+                print(f"{FAIL_COLOR}Failed to convert {life_file} ({attempts} of {self.config['watch_retries']} attempts): {failed[life_file]!r}{END_COLOR}")
+
+                if attempts >= self.config['watch_retries']:
+                    stats['quarantined'] += 1
+                    print(f"{FAIL_COLOR}{life_file} is left alone until it changes.{END_COLOR}")
+            else:
+                converted[life_file] = current[life_file]
+                failures.pop(life_file, None)
+                latency = max(finished - modified[life_file], 0)
+                stats['files'] += 1
+                stats['latency'] += latency
+                stats['max_latency'] = max(stats['max_latency'], latency)
+
+        print(self.watch_report())
+        path = join(expanduser(self.config['output_path']), WATCH_STATS_FILE)
+
+        with open(f"{path}.tmp", 'w') as stats_file:
+            json.dump(dict(stats, reused_locations=self.solved_stats['reused']), stats_file, indent=1)
+
+        os.replace(f"{path}.tmp", path)
+
+    def input_files(self):
+        """
+        Returns:
+            :obj:`list` of string: names of the files in the input directory, sorted
+        """
+        input_path = self.config['input_path']
+        return sorted([name for name in os.listdir(input_path) if isfile(join(input_path, name))])
+
+    def file_signature(self, life_file):
+        """
+        Args:
+            life_file (string): name of the LIFE file
+        Returns:
+            :obj:`tuple`: modification time (in nanoseconds) and size of the file, which change when it's written
+        """
+        stat = os.stat(join(self.config['input_path'], life_file))
+        return stat.st_mtime_ns, stat.st_size
+
+    def start_workers(self, workers):
+        """ Starts the worker processes, if there's more than one
+        Args:
+            workers (int): number of worker processes
+        """
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(self.config, self.backend_name)) if workers > 1 else None
+
+    def stop_workers(self):
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    def convert_input(self, life_files, failed=None):
+        """ Converts LIFE files from the input directory. Coordinates are solved for every file first, then the routes of all
+        their legs are planned and requested at once, and finally the days are routed, rendered and written (see
+        `convert_outputs`) to a file per day, or to a file per LIFE file or month. With more than one worker, coordinates are
+        still solved file by file in this process (so results don't depend on the number of workers), and days are rendered (and
+        routes calculated, with an in-process routing backend) in a process pool. In incremental mode, only the days that changed
+        since they were last converted (see `is_converted`) are converted, files without any are skipped, and LIFE files are left
+        in the input directory
+        Args:
+            life_files (:obj:`list` of string): names of the LIFE files, in the order they're read
+            failed (:obj:`dict`, optional): if set, files that can't be read (or whose coordinates can't be solved) are left out
+            of the conversion, and the error of each one is added to it by name, instead of being raised
+        Returns:
+            int: number of days converted
+        """
+
+        files = []
+        self.day_hashes = {}
+        self.day_outputs = {}
+        self.incomplete = set()
+
+        if self.incremental:
+            self.load_manifest()
+
+        for life_file in life_files:
+            try:
+                files.append(self.read_input(life_file))
+            except Exception as error:
+                if failed == None:
+                    raise
+
+                failed[life_file] = error
+
+        for life_file, life, locations, day_hashes in files:
+            self.day_hashes.update(day_hashes)
+
+        files = [(life_file, life, locations) for life_file, life, locations, day_hashes in files]
+        outputs = self.output_groups(files)
+        self.plan_routes(outputs)
+        self.convert_outputs(outputs)
+
+        if self.route_cache:
+            self.route_cache.flush()
+
+        if self.incremental:
+            self.save_manifest(life_files)
+        else:
+            # input files are only moved once all of their days have been written, in the order they were read
+            for life_file, life, locations in files:
+                self.archive_file(life_file)
+
+        return sum([len([day for locations, day in days if locations != None]) for name, days in outputs])
+
+    def read_input(self, life_file):
+        """ Reads a LIFE file from the input directory and solves its locations' coordinates. In incremental mode, its days are
+        hashed, and its coordinates are only solved if any of them changed
+        Args:
+            life_file (string): name of the LIFE file
+        Returns:
+            :obj:`tuple`: name, life.Life object and solved location coordinates (None if none of its days changed) of the LIFE 
+            file, and the hash of each of its days by date (empty if not in incremental mode)
+        """
+
+        self.life = Life()
+        self.life.from_file(os.path.join(self.config['input_path'], life_file))
+        self.days = self.life.days
+        self.locations = {}
+        day_hashes = {}
+
+        if self.incremental:
+            # days are hashed before their places are replaced by coordinates
+            day_hashes = {day.date: self.day_hash(day) for day in self.days_with_routes()}
+
+            if all([self.is_converted(life_file, day, day_hashes[day.date]) for day in self.days_with_routes()]):
+                print(f"Skipping {life_file}, its days haven't changed since they were converted.")
+                return life_file, self.life, None, day_hashes
+
+        print(f"Processing {life_file}...")
+        self.solve_locations(life_file)
+
+        return life_file, self.life, self.locations, day_hashes
+
+    def print_reports(self):
+        """ Prints the output, stages, route simplification, caches and routing backend reports
+        """
+
+        print(self.output_report())
+        print(self.stage_report())
+        if self.config['simplify_tolerance']:
+            print(self.simplify_report())
+
+        print(self.routes.report())
+        if self.route_cache:
+            print(self.route_cache.report())
+        if self.scheduler:
+            print(self.scheduler.report())
+            for name, backend in self.backends.items():
+                print(backend.usage_report(self.scheduler.sent[name]))
+        else:
+            print(self.backend.report())
+
+        if self.leg_stats['failed'] > 0:
+            print(f"{FAIL_COLOR}{self.leg_stats['failed']} legs could not be routed and are missing from the generated files.{END_COLOR}")
+
+    def watch_report(self):
+        """
+        Returns:
+            string: number of files and days converted in watch mode, latency per file and files whose coordinates were reused
+        """
+
+        stats = self.watch_stats
+        latency = stats['latency'] / stats['files'] if stats['files'] > 0 else 0
+        solved = self.solved_stats
+
+        return (f"Watch: converted {stats['files']} files ({stats['failed']} failed attempts, {stats['quarantined']} files left alone "
+            f"until they change) and {stats['days']} days, latency per file "
+            f"{latency:.2f}s (max {stats['max_latency']:.2f}s), coordinates reused for {solved['reused']} of "
+            f"{solved['reused'] + solved['solved']} files.")
+
+    def output_report(self):
+        """
+        Returns:
+            string: number of files, points and bytes written, and the time spent rendering and writing them
+        """
+
+        stats = self.output_stats
+        seconds = self.stage_stats['rendering'] + self.stage_stats['writing']
+        point_size = stats['bytes'] / stats['points'] if stats['points'] > 0 else 0
+        rate = stats['points'] / seconds if seconds > 0 else 0
+
+        return (f"Wrote {stats['files']} {self.output_format} files: {stats['points']} points, {stats['bytes'] / 1024:.1f} KB "
+            f"({point_size:.1f} bytes per point) in {seconds:.2f}s ({rate:.0f} points/s).")
+
+    def stage_report(self):
+        """
+        Returns:
+            string: time spent in each stage of the conversion (rendering time is added up across worker processes)
+        """
+
+        stats = self.stage_stats
+
+        return (f"Stages: routing {stats['routing']:.2f}s, rendering {stats['rendering']:.2f}s ({self.workers} processes), "
+            f"writing {stats['writing']:.2f}s ({stats['waiting']:.2f}s waiting for rendered days).")
+
+    def simplify_report(self):
+        """
+        Returns:
+            string: points kept by the route simplification, and points (and an estimate of the bytes) left out of the written files
+        """
+
+        stats = self.simplify_stats
+        kept = 100 * stats['kept'] / stats['points'] if stats['points'] > 0 else 100
+        point_size = self.output_stats['bytes'] / self.output_stats['points'] if self.output_stats['points'] > 0 else 0
+
+        return (f"Route simplification ({self.config['simplify_tolerance']} m): kept {stats['kept']} of {stats['points']} route points "
+            f"({kept:.1f}%), {stats['dropped']} points (~{stats['dropped'] * point_size / 1024:.1f} KB) left out of the written files.")
+
+    def archive_file(self, life_file):
+        """ Moves a converted LIFE file into the output directory
+        Args:
+            life_file (string): name of the LIFE file
+        """
+
+        life_path = join(expanduser(self.config['input_path']), life_file)
+        output_path = join(expanduser(self.config['output_path']), life_file)
+        rename(life_path, output_path)
 
     def get_locations_max_distance(self):
         """ Creates an object that calculates the max distance between locations based on the average travel time between 
@@ -123,68 +568,182 @@ class LIFEToTrackConverter(object):
 
         self.distances = res
 
-    def calculate_location_coords(self):
+    def solve_locations(self, life_file=None):
+        """ Solves the coordinates of the LIFE file's locations. The last coordinates solved for each file are kept with what 
+        they're solved from (the travel times between locations and the meta-commands about places), so a file that's converted
+        again keeps its coordinates, and its routes, if that didn't change. In incremental mode, they're also kept in the manifest,
+        and if the file changed, the places that were already solved keep their coordinates, so the days that weren't converted 
+        again and the ones that were place them in the same spot
+        Args:
+            life_file (string, optional): name of the LIFE file
+        """
+
+        self.get_locations_max_distance()
+        life = self.life
+        key = hashlib.sha1(json.dumps([self.distances, life.coordinates, life.superplaces, life.nameswaps, life.locationswaps], 
+            sort_keys=True).encode()).hexdigest()
+        solved_key, locations = self.solved_locations.get(life_file, (None, None))
+
+        if key == solved_key:
+            self.locations = dict(locations)
+            self.solved_stats['reused'] += 1
+        else:
+            self.calculate_location_coords(locations if self.incremental else None)
+            self.solved_locations[life_file] = (key, dict(self.locations))
+            self.solved_stats['solved'] += 1
+
+    def calculate_location_coords(self, previous=None):
         """ Gradually reduces the bounding boxes of possible point locations throughout several iterations, 
         finishing with the generation of coordinates in the final bounding box for each location. If coordinates are explicitly defined in 
-        the LIFE file, these are used.
+        the LIFE file, these are used. Each iteration tests and draws the points of every location at once, and then tightens the
+        bounds of their destinations
+        Args:
+            previous (:obj:`dict`, optional): coordinates solved before for the LIFE file's locations, which are kept (unless
+            they're explicitly defined in the LIFE file)
         """
 
-        candidate_bounds = {}
+        known = {location: (coords['lat'], coords['lng']) for location, coords in (previous or {}).items() if coords != None}
+        known.update(self.life.coordinates)
+
         locations = temp_locations = list(self.distances.keys())
+        candidate_bounds = np.empty((len(locations), 4))
 
-        # sets initial bounds (defined in config file) and moves locations with known coords to the top of the list to be sorted first
+        # moves locations with known coords to the top of the list to be sorted first
         for location in temp_locations:
-            if location in self.life.coordinates:
+            if location in known:
                 locations.insert(0, locations.pop(locations.index(location)))
-                coords = self.life.coordinates[location]
+            self.locations[location] = None
+
+        index = {location: i for i, location in enumerate(locations)}
+
+        # sets initial bounds (defined in config file)
+        for i, location in enumerate(locations):
+            if location in known:
+                coords = known[location]
                 centre = coords_obj(coords[0], coords[1])
-                candidate_bounds[location] = bounding_locations(centre, 0.1) #set bounds to 0.1km radius from known coordinates
+                candidate_bounds[i] = bounds_to_box(bounding_locations(centre, 0.1)) #set bounds to 0.1km radius from known coordinates
             else:
-                candidate_bounds[location] = self.bounds 
-            self.locations[location] = None
+                candidate_bounds[i] = bounds_to_box(self.bounds)
 
-        for i in range(0, self.config['bounds_iterations']):
-            for origin in locations:
-                if origin in self.life.coordinates: # if coordinates are explicitly defined in LIFE file, set them
-                    coords = self.life.coordinates[origin]
-                    self.locations[origin] = coords_obj(coords[0], coords[1]) 
-                elif self.locations[origin] == None or is_point_in_bounds(self.locations[origin], candidate_bounds[origin]): #if point isn't set yet or candidate point no longer in candidate bounds 
-                    self.locations[origin] = self.random_point_in_bounds(candidate_bounds[origin])
-                
-                for destination in self.distances[origin]:
-                    possible_radius = bounding_locations(self.locations[origin], self.distances[origin][destination]['max_distance'])
-                    candidate_bounds[destination] = bounds_intersection(candidate_bounds[destination], possible_radius)   
+        # origin, destination and max distance of each pair of locations travelled between, by origin
+        origins = np.array([i for i, origin in enumerate(locations) for destination in self.distances[origin]], dtype=int)
+        destinations = np.array([index[destination] for origin in locations for destination in self.distances[origin]], dtype=int)
+        max_distances = np.array([self.distances[origin][destination]['max_distance'] for origin in locations for destination in self.distances[origin]], dtype=float)
+
+        # each destination's bounds are tightened by its origins in order, one at a time: the n-th round holds the n-th pair of 
+        # each destination
+        order = np.argsort(destinations, kind='stable')
+        ranks = np.empty(len(order), dtype=int)
+        ranks[order] = np.arange(len(order)) - np.searchsorted(destinations[order], destinations[order])
+        rounds = [np.flatnonzero(ranks == rank) for rank in range(ranks.max() + 1 if len(ranks) > 0 else 0)]
+
+        is_known = np.array([location in known for location in locations], dtype=bool)
+        lats = np.array([known[location][0] if location in known else 0 for location in locations], dtype=float)
+        lngs = np.array([known[location][1] if location in known else 0 for location in locations], dtype=float)
+        is_set = is_known.copy()
+
+        for _ in range(0, self.config['bounds_iterations']):
+            # coordinates explicitly defined in the LIFE file (or solved before) are kept, the others are drawn if they aren't 
+            # set yet or the candidate point is in the candidate bounds
+            redraw = ~is_known & (~is_set | points_in_boxes(lats, lngs, candidate_bounds, normalized=True))
+
+            for i in np.flatnonzero(redraw):
+                lats[i], lngs[i] = self.random_point_in_box(candidate_bounds[i])
+            is_set[:] = True
+
+            possible_radius = bounding_boxes(lats[origins], lngs[origins], max_distances)
+
+            for pairs in rounds:
+                candidate_bounds[destinations[pairs]] = boxes_intersection(candidate_bounds[destinations[pairs]], possible_radius[pairs], normalized=True)
+
+        for i, location in enumerate(locations):
+            self.locations[location] = coords_obj(float(lats[i]), float(lngs[i]))
 
         self.update_LIFE_locations()
         
     def set_api(self):
-        """ Selects what API to use based on if explicitly set and/or based on what keys were set in the configuration file
+        """ Selects what routing backend to use based on if explicitly set and/or based on what keys were set in the configuration 
+        file. Tom Tom is preferred over Google, and routes are calculated locally if neither key is set
+        """
+
+        if self.backend_name in (None, 'tomtom', 'google'):
+            preference = ['google', 'tomtom'] if self.backend_name == 'google' else ['tomtom', 'google']
+            available = [name for name in preference if len(api_key(name, self.config)) > 0]
+
+            if len(available) == 0:
+                print("No Google Maps or TomTom API key set, using the local routing engine to generate routes.")
+                self.backend_name = 'local'
+            else:
+                self.backend_name = available[0]
+
+    def set_route_cache(self):
+        """ Creates the in-memory route cache and opens the persistent route cache, if a path for it is set in the configuration file
+        """
+
+        cache_config = self.config['route_cache']
+        self.routes = MemoryRouteCache(cache_config['memory_max_routes'])
+
+        if cache_config['path']:
+            self.route_cache = RouteCache(cache_config['path'], cache_config['max_routes'], cache_config['ttl'], cache_config['flush_hits'])
+        else:
+            self.route_cache = None
+
+    def set_backends(self):
+        """ Creates the selected routing backend and, for remote backends, the scheduler that sends their requests through a 
+        fetcher per backend (with the concurrency and rate limits set for it), failing over to the other API if its key is set
         """
 
-        # if no API key is set, quit program
-        if len(self.config['google_maps_api_key']) == 0 and len(self.config['tom_tom_api_key']) == 0:
-            print(f"{FAIL_COLOR}No API set to generate routes.\nPlease set a Google Maps or TomTom API key in your configuration JSON file.{END_COLOR}")
-            quit()
+        self.backend = create_backend(self.backend_name, self.config)
+        self.backends = {self.backend_name: self.backend}
+        self.scheduler = None
+
+        if not self.backend.remote:
+            return
+
+        for name in self.backend.failover:
+            if len(api_key(name, self.config)) > 0:
+                self.backends[name] = create_backend(name, self.config)
+
+        fetchers = [(name, RouteFetcher(backend.config['concurrency'], backend.config['requests_per_second'], backend.config['timeout']), backend.config['daily_quota']) for name, backend in self.backends.items()]
+
+        self.fetcher = fetchers[0][1]
+        self.scheduler = RequestScheduler(fetchers, **self.config['routing']['scheduler'])
 
-        # checks if Google API key is set, uses Tom Tom API key if not
-        if self.google_maps_api:
-            if len(self.config['google_maps_api_key']) > 0:
-                self.api_key = self.config['google_maps_api_key']
-                print("Using Google Maps Directions API to generate routes.")
-            elif len(self.config['tom_tom_api_key']) > 0:
-                self.api_key = self.config['tom_tom_api_key']
-                self.google_maps_api = False
-                print("Using Tom Tom Routing API to generate routes.")
+    def stats_sources(self):
+        """
+        Returns:
+            :obj:`dict`: stats gathered while converting, by source (route caches, routing requests and legs)
+        """
 
-        # checks if Tom Tom API key is set, uses Google API key if not
+        sources = {'memory': self.routes.stats, 'legs': self.leg_stats, 'simplify': self.simplify_stats, 'output': self.output_stats}
+        if self.scheduler:
+            sources['requests'] = self.scheduler.stats
         else:
-            if len(self.config['tom_tom_api_key']) > 0:
-                self.api_key = self.config['tom_tom_api_key']
-                self.google_maps_api = False
-                print("Using Tom Tom Routing API to generate routes.")
-            elif len(self.config['google_maps_api_key']) > 0:
-                self.api_key = self.config['google_maps_api_key']
-                print("Using Google Maps Directions API to generate routes.")
+            sources[self.backend_name] = self.backend.stats
+        if self.route_cache:
+            sources['persistent'] = self.route_cache.stats
+
+        return sources
+
+    def run_stats(self):
+        """
+        Returns:
+            :obj:`dict`: copy of the stats gathered while converting, by source
+        """
+
+        return {source: dict(stats) for source, stats in self.stats_sources().items()}
+
+    def merge_run_stats(self, stats):
+        """ Adds stats gathered by a worker process to the ones of this instance
+        Args:
+            stats (:obj:`dict`): stats by source, as returned by `run_stats`
+        """
+
+        sources = self.stats_sources()
+
+        for source in stats:
+            for key in stats[source]:
+                sources[source][key] += stats[source][key]
 
     def get_bounds(self):
         """ Stores bounds for random coordinates generation defined in the config file
@@ -202,46 +761,22 @@ class LIFEToTrackConverter(object):
         """ 
     
         for location in self.life.all_places():
-            if (location in self.life.superplaces.keys()):
+            if (self.locations.get(self.life.superplaces.get(location)) != None):
                 self.locations[location] = self.locations[self.life.superplaces[location]] # if subplace, set the coordinates of its superplace
             
-            if (location in self.life.nameswaps or location in self.life.locationswaps):
-                self.locations[self.life.nameswaps[location][0]] = self.locations[location] # if place changed name or if something new in same location, copies coords from original to new
+            for swaps in (self.life.nameswaps, self.life.locationswaps):
+                if (location in swaps and self.locations.get(location) != None):
+                    self.locations[swaps[location][0]] = self.locations[location] # if place changed name or if something new in same location, copies coords from original to new
           
-    def distance(self, coords1, coords2): 
-        """ Calculates distance, in km, of two coordinates defined by latitude and longitude
-        taken from https://www.geeksforgeeks.org/program-distance-two-points-earth/#:~:text=For%20this%20divide%20the%20values,is%20the%20radius%20of%20Earth.
-
+    def random_point_in_box(self, box):
+        """ Generates a random latitude/longitude pair inside a box
         Args:
-            coords1 (:obj:`dict`): Coordinates of the first point
-            coords2 (:obj:`dict`): Coordinates of the second point
-        Returns:
-            float: distance between both points
-        """
-        lat1 = radians(coords1['lat'])
-        lng1 = radians(coords1['lng'])
-        lat2 = radians(coords2['lat'])
-        lng2 = radians(coords2['lng'])
-        
-        # Haversine formula
-        dlng = lng2 - lng1 
-        dlat = lat2 - lat1
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlng / 2)**2
-    
-        c = 2 * asin(sqrt(a))
-        
-        return abs(c * EARTH_RADIUS)
-
-    def random_point_in_bounds(self, bounds):
-        """ Generates a random latitude/longitude pair inside specified bounds
+            box (:obj:`numpy.ndarray`): [min_lat, min_lng, max_lat, max_lng] box
         Returns:
-            :obj:`dict`: Coordinates defined by a dictionary with 'lat' and 'lng' keys
+            :obj:`tuple`: latitude and longitude of the point
         """
 
-        lat = random.uniform(min(bounds[0]['lat'], bounds[1]['lat']), max(bounds[0]['lat'], bounds[1]['lat']))
-        lng = random.uniform(min(bounds[0]['lng'], bounds[1]['lng']), max(bounds[0]['lng'], bounds[1]['lng']))
-
-        return coords_obj(lat, lng)
+        return random.uniform(box[0], box[2]), random.uniform(box[1], box[3])
 
     def calculate_speed(self, distance, time):
         """ Calculates the speed given the distance and time
@@ -256,181 +791,192 @@ class LIFEToTrackConverter(object):
         else: 
             return distance / time
 
-    def parse_duration_in_seconds(self, response):
-        """ Parses duration from http request response into seconds
+    def parse_coords(self, coords):
+        """ Parses coordinates into a formatted string for an http request 
         Args:
-            response (:obj:`dict`:): http response for the routing request
+            coords (:obj:`tuple`:): coordinate pair containing latitude and longitude
         Returns:
-            int: duration in seconds
+            string: formatted string to be set as an http request parameter => "lat, lng"
         """
+        return f"{coords['lat']},{coords['lng']}"
 
-        if self.google_maps_api:
-            string = response['routes'][0]['legs'][0]['distance']['text']
-            words = string.split(" ")
-            hours = mins = 0
-
-            if "hour" in words[1]:
-                hours = int(words[0])
-                if len(words) == 4:
-                    mins = int(words[2])
-            elif "min" in words[1]:
-                mins = int(words[0])
-            result = 3600 * hours + 60 * mins
-        else:
-            result = response['routes'][0]['summary']['travelTimeInSeconds']
-        
-        return result
-
-    def parse_distance_in_metres(self, response):
-        """ Parses distance from http request response into metres
+    def get_timed_route(self, start, end, start_time, end_time, data_type = 'json'):
+        """ Calculates route for a span, from "start" to "end", that starts at "start_time" and ends at "end_time". The timestamps of
+        its points are left to be calculated when it's rendered
         Args:
-            response (:obj:`dict`:): http response for the routing request
+            start (string): coordinates (or location name) of the route's origin
+            end (string): coordinates (or location name) of the route's destination
+            start_time (string): formatted string representing the route's start time in the `%Y-%m-%dT%H:%M:%SZ` format
+            end_time (string): formatted string representing the route's end time in the `%Y-%m-%dT%H:%M:%SZ` format
+            data_type (string): string representing data type to be returned by the api
         Returns:
-            float: distance in metres 
+            :obj:`tuple`: the route's geometry, start and end times (in seconds since the epoch) and speed (in m/s), or None if the
+            route couldn't be calculated
         """
-        result = 0
 
-        if self.google_maps_api:
-            string = response['routes'][0]['legs'][0]['distance']['text']
+        start_epoch = parse_timestamp(start_time)
+        end_epoch = parse_timestamp(end_time)
+        total_time = end_epoch - start_epoch
 
-            words = string.split(" ")
-            kms = 0
+        # check if the route has been calculated previously (in this run or, if the persistent cache is in use, in a previous one)
+        route = self.routes.get(start, end)
 
-            if "km" in words[1]:
-                kms = float(words[0])
-                
-            result = kms * 1000
-        else:
-            result = response['routes'][0]['summary']['lengthInMeters']
+        if route == None:
+            route = self.route_cache.get(self.provider(), start, end) if self.route_cache else None
 
-        return result
-    
-    def parse_coords(self, coords):
-        """ Parses coordinates into a formatted string for an http request 
-        Args:
-            coords (:obj:`tuple`:): coordinate pair containing latitude and longitude
-        Returns:
-            string: formatted string to be set as an http request parameter => "lat, lng"
-        """
-        return f"{coords['lat']},{coords['lng']}"
+            if route == None:
+                route = self.request_route(start, end, data_type)
+
+                if route == None:
+                    return None
+
+                if self.route_cache:
+                    self.route_cache.put(self.provider(), start, end, route['points'], route['distance'], route['duration'])
+
+            route = self.freeze(route)
+            self.routes.put(start, end, route) # saves calculated route for future reference 
+
+        total_distance = route['distance']
+        avg_speed = self.calculate_speed(total_distance, total_time)
 
-    def parse_points(self, response):
-        """ Parses points into a list of coordinate pairs
+        self.simplify_stats['dropped'] += route['original_points'] - len(route['geometry'])
+
+        # the cached geometry is shared by every use of the route, only the timestamps are calculated for each one
+        return route['geometry'], start_epoch, end_epoch, avg_speed
+
+    def freeze(self, route):
+        """ Converts a route into the form it is kept in memory, simplifying its geometry if a tolerance is set in the configuration
+        file
         Args:
-            response (:obj:`tuple`:): http response for the routing request 
+            route (:obj:`dict`): route's points, distance (in metres), duration (in seconds) and the backend that calculated it
         Returns:
-            :obj:`list`: of :obj:`tuple`: list of point coordinate pairs 
+            :obj:`dict`: route's geometry, distance, duration, backend and number of points before simplification
         """
-        if self.google_maps_api:
-            polyline_points = response['routes'][0]['overview_polyline']['points'] 
-            return polyline.decode(polyline_points)
-        else:
-            return [(point['latitude'], point['longitude']) for point in response['routes'][0]['legs'][0]['points']]
 
-    def get_route(self, start, end, start_time, end_time, data_type = 'json'):
-        """ Calculates route for a span, from "start" to "end", that starts at "start_time" and ends at "end_time"
+        frozen = freeze_route(route, self.config['simplify_tolerance'])
+        frozen['original_points'] = len(route['points'])
+
+        self.simplify_stats['points'] += frozen['original_points']
+        self.simplify_stats['kept'] += len(frozen['geometry'])
+
+        return frozen
+
+    def request_route(self, start, end, data_type = 'json'):
+        """ Requests directions between 2 locations from the selected routing backend (failing over to the other API if needed)
         Args:
             start (string): coordinates (or location name) of the route's origin
             end (string): coordinates (or location name) of the route's destination
-            start_time (string): formatted string representing the route's start time in the `%Y-%m-%dT%H:%M:%SZ` format
-            end_time (string): formatted string representing the route's end time in the `%Y-%m-%dT%H:%M:%SZ` format
             data_type (string): string representing data type to be returned by the api
         Returns:
-            :obj:`list` of :obj:`dict`: list containing the latitude, longitude and timestamps of the points that describe the route
+            :obj:`dict`: route's points (list of latitude, longitude pairs), distance (in metres), duration (in seconds) and the 
+            backend that calculated it, or None if the request failed
         """
 
-        start_datetime = datetime.strptime(start_time,'%Y-%m-%dT%H:%M:%SZ')
-        end_datetime = datetime.strptime(end_time,'%Y-%m-%dT%H:%M:%SZ')
-        total_time = (end_datetime - start_datetime).total_seconds()
+        if not self.backend.remote:
+            return self.backend.route(start, end)
 
-        timestamp = start_datetime
+        provider, status, body = self.scheduler.send(lambda provider: self.backends[provider].route_request([start, end], data_type))
 
-        # check if the route has been calculated previously, and update timestamps if so
-        if (start in self.routes and end in self.routes[start]): 
-            total_distance = self.routes[start]['total_distance']
-            points = self.routes[start][end]
-            avg_speed = self.calculate_speed(total_distance, total_time)
+        if status == None or status not in range(200, 299):
+            return None
 
-            for i in range(0, len(points) - 1):
-                point = points[i]
-                next_point = points[i + 1]
-                
-                point['time'] = timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')
-                time_btwn_points = self.calculate_time_btwn_points(point, next_point, avg_speed)
-                timestamp += timedelta(seconds=time_btwn_points)
+        return self.backends[provider].parse_route(body)
 
-            points[len(points) - 1]['time'] = end_time # sets end time to last point
+    def request_group(self, group):
+        """ Requests the routes for a group of chains of legs in a single request. If no API can take the whole group, its 
+        chains (or legs) are requested separately
+        Args:
+            group (:obj:`list` of :obj:`list` of :obj:`tuple`): chains of consecutive legs, as planned by `routing.batching.plan_requests`
+        Returns:
+            :obj:`list` of :obj:`dict`: route of each leg in the group (None for the legs whose request failed)
+        """
 
-            return points
-        
-        # http request setup
-        if self.google_maps_api:
-            endpoint = f"https://maps.googleapis.com/maps/api/directions/{data_type}"
-            params = {"origin": start, "destination": end, "key":  self.config['google_maps_api_key']}
-        else:
-            endpoint = f"https://api.tomtom.com/routing/1/calculateRoute/{start}:{end}/{data_type}"
-            params = {"routeRepresentation": "polyline", "key":  self.config['tom_tom_api_key']} 
+        if len(group) > 1:
+            routes = self.request_batch(group)
+            if routes != None:
+                return routes
+            return [route for chain in group for route in self.request_group([chain])]
 
-        url_params = urlencode(params)
-        url = f"{endpoint}?{url_params}"
+        chain = group[0]
 
-        # requests directions between 2 locations from the either the Tom Tom Routing or Google Maps Directions API 
-        r = requests.get(url)
+        if len(chain) > 1:
+            routes = self.request_chain(chain)
+            if routes != None:
+                return routes
 
-        result = {}
-        if r.status_code not in range(200, 299):
-            return {}
+        return [self.request_route(*leg) for leg in chain]
 
-        try:
-            result = r.json()
-            if 'OK' not in result['status'] or 'detailedError' in result: # checks if request was successful 
-                return {} 
-        except:
-            pass
+    def chain_locations(self, chain):
+        """
+        Args:
+            chain (:obj:`list` of :obj:`tuple`): consecutive legs
+        Returns:
+            :obj:`list` of string: coordinates of the chain's origin, waypoints and destination
+        """
+        return [chain[0][0]] + [end for start, end in chain]
 
-        raw_points = self.parse_points(result) # points that describe the route
-        total_distance = self.parse_distance_in_metres(result)
-        avg_speed = self.calculate_speed(total_distance, total_time)
-        
-        points = []
+    def request_chain(self, chain, data_type = 'json'):
+        """ Requests the routes of consecutive legs in a single request, routing through their waypoints
+        Args:
+            chain (:obj:`list` of :obj:`tuple`): consecutive legs
+            data_type (string): string representing data type to be returned by the api
+        Returns:
+            :obj:`list` of :obj:`dict`: route of each leg (None for all legs if the request failed), or None if no API could take 
+            the request
+        """
 
-        for i in range(0, len(raw_points) - 1):
-            point = coords_obj(raw_points[i][0], raw_points[i][1])
-            next_point = coords_obj(raw_points[i + 1][0], raw_points[i + 1][1])
+        locations = self.chain_locations(chain)
+        providers = [name for name, backend in self.backends.items() if backend.max_waypoints >= len(locations)]
 
-            time_btwn_points = self.calculate_time_btwn_points(point, next_point, avg_speed) # calculates step between points (just an average)
-            
-            point['time'] = timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')
-            points.append(point)
-            timestamp += timedelta(seconds=time_btwn_points)
+        provider, status, body = self.scheduler.send(lambda provider: self.backends[provider].route_request(locations, data_type), providers=providers)
 
-        points.append(coords_obj(raw_points[len(raw_points) - 1][0], raw_points[len(raw_points) - 1][1], end_time)) # sets coordinates and end time for last point
+        if status == None:
+            return None
 
-        self.routes[start] = {end: points, 'total_distance': total_distance} # saves calculated route for future reference 
+        if status not in range(200, 299):
+            return [None] * len(chain)
 
-        return points
+        return self.backends[provider].parse_legs(body, len(chain))
 
-    def calculate_time_btwn_points(self, coords1, coords2, speed):
-        """ calculates the time, in seconds, between 2 points given a certain speed (in m/s)
+    def request_batch(self, group, data_type = 'json'):
+        """ Requests the routes of several chains of legs in a single batch request
         Args:
-            coords1 (:obj:`dict`:): coordinates for 1st point 
-            coords2 (:obj:`dict`:): coordinates for 2nd point
-            speed (float): speed used in the route
-        Return:
-            float: time between both points give the speed 
+            group (:obj:`list` of :obj:`list` of :obj:`tuple`): chains of consecutive legs
+            data_type (string): string representing data type to be returned by the api
+        Returns:
+            :obj:`list` of :obj:`dict`: route of each leg in the group (None for the legs whose request failed), or None if no 
+            API could take the request
         """
 
-        length = self.distance(coords1, coords2) * 1000
-        
-        return (length / speed) 
+        chains = [self.chain_locations(chain) for chain in group]
+        providers = [name for name, backend in self.backends.items() if backend.batch_size > 1]
+
+        # each item of a batch counts as a request
+        provider, status, body = self.scheduler.send(lambda provider: self.backends[provider].batch_request(chains, data_type), cost=len(group), providers=providers)
+
+        if status == None:
+            return None
+
+        if status not in range(200, 299):
+            return [None] * sum(len(chain) for chain in group)
+
+        return self.backends[provider].parse_batch(body, [len(chain) for chain in group])
 
-    def get_segments(self, day):
-        """ Calculates routes for all spans in a LIFE day. Connects two consecutive spans with a route that starts at the span location's 
-        final timestamp and ends at the second  span location's start timestamp.
+    def provider(self):
+        """
+        Returns:
+            string: name of the routing backend in use, which routes are stored under in the persistent route cache (including
+            the ones requested to the other API after failing over, so they are found in later runs)
+        """
+        return self.backend_name
+
+    def get_legs(self, day):
+        """ Lists the legs travelled in a LIFE day. Two consecutive spans are connected by a leg that starts at the span location's 
+        final timestamp and ends at the second span location's start timestamp.
         Args:
             day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
         Returns:
-            :obj:`list` of :obj:`list` of :obj:`dict`: list that contains a list of the points that define the selected day's routes 
+            :obj:`list` of :obj:`tuple`: origin coordinates, destination coordinates, start time and end time of each leg
         """ 
 
         res = []
@@ -461,99 +1007,494 @@ class LIFEToTrackConverter(object):
             if (start_time == end_time):
                 continue
 
-            route = self.get_route(start_coords, end_coords, start_time, end_time)
-            
-            res.append(route)
+            res.append((start_coords, end_coords, start_time, end_time))
         
         return res
 
-    def point_gpx(self, point):
-        """ Parses a point into an xml tag for the gpx file that defines the track 
+    def timed_segments(self, day):
+        """ Calculates routes for all legs in a LIFE day, one at a time, skipping the legs that can't be routed
         Args:
-            point (:obj:`dict`): route point defined by latitude (lat), longitude (lng) and timestamp (time)
-        Returns:
-            string: xml tag <trkpt> that defines a point in the gpx format
+            day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
+        Yields:
+            :obj:`tuple`: geometry, start time, end time and speed of each of the selected day's routes (see `get_timed_route`)
+        """ 
+
+        for start, end, start_time, end_time in self.get_legs(day):
+            route = self.get_timed_route(start, end, start_time, end_time)
+
+            if route == None:
+                self.leg_stats['failed'] += 1
+                print(f"{FAIL_COLOR}Could not route leg {start} -> {end} ({start_time} - {end_time}).{END_COLOR}")
+                continue
+
+            self.output_stats['points'] += len(route[0])
+            yield route
+
+    def plan_routes(self, outputs):
+        """ Collects the legs of every day to convert (following the same rules as `timed_segments`) and requests the routes that 
+        aren't cached yet before any day is written, so each route is requested once however many times it is travelled. If the 
+        routes don't fit in the in-memory route cache (and there's no persistent cache to keep them), they are requested per group 
+        of days instead
+        Args:
+            outputs (:obj:`list` of :obj:`tuple`): name of each output file and its days (see `output_groups`)
         """
-        return ''.join([
-            indentation(3),
-            '<trkpt lat="' + str(point['lat']) + '" lon="' + str(point['lng']) + '">\n',
-            indentation(4),
-            '<time>' + str(point['time']) + '</time>\n',
-            indentation(3),
-            '</trkpt>'
-        ]) + '\n'
 
-    def segment_gpx(self, segment):
-        """ Parses a segment of a route into an xml tag for the gpx file that defines the track 
+        legs = []
+        n_days = 0
+
+        for name, days in outputs:
+            for locations, day in days:
+                if locations == None:
+                    continue
+
+                self.locations = locations
+                legs += [(start, end) for start, end, start_time, end_time in self.get_legs(day)]
+                n_days += 1
+
+        frequencies = Counter(legs)
+        summary = f"Planned {len(legs)} legs in {n_days} days: {len(frequencies)} unique routes (travelled up to {max(frequencies.values(), default=0)} times)"
+
+        if not self.backend.remote and not self.executor:
+            print(f"{summary}, calculated when needed.")
+        elif len(frequencies) > self.routes.max_routes and not self.route_cache:
+            print(f"{summary}, more than the in-memory route cache holds ({self.routes.max_routes}), requested per group of days.")
+        elif not self.backend.remote:
+            requested, requests = self.prefetch_routes(legs)
+            print(f"{summary}, {len(frequencies) - requested} cached, {requested} calculated by {self.workers} worker processes.")
+        else:
+            requested, requests = self.prefetch_routes(legs)
+            print(f"{summary}, {len(frequencies) - requested} cached, {requested} requested in {requests} requests.")
+
+    def prefetch_routes(self, legs):
+        """ Requests every route that isn't cached yet concurrently, storing them in the route caches before the days are routed.
+        Consecutive legs are routed through waypoints and, if the API supports it, several of those requests are sent in one batch.
+        With an in-process routing backend, routes are calculated by the worker processes (if there's more than one worker)
         Args:
-            segment (:obj:`list` of :obj:`dict`): list of points that define a segment of the route
+            legs (:obj:`list` of :obj:`tuple`): origin and destination coordinates of the routes that will be needed, in the order they are travelled
         Returns:
-            string: xml tag <trkseg> that defines a segment in the gpx format
+            :obj:`tuple`: number of routes that weren't cached and number of requests sent for them
         """
 
-        if (len(segment) == 0):
-            return ''
+        # with a single process, in-process routes are calculated when they are needed, there's no latency to hide
+        if not self.backend.remote and not self.executor:
+            return 0, 0
 
-        points = ''.join([self.point_gpx(point) for point in segment])
-        
-        return ''.join([
-            indentation(2) + '<trkseg>\n',
-            points,
-            indentation(2) + '</trkseg>\n',
-        ]) + '\n'
+        # the cached routes are refreshed, so the ones still needed aren't evicted while the missing ones are stored
+        missing = [leg for leg in unique_legs(legs) if not self.routes.touch(*leg)]
+
+        if self.route_cache:
+            cached = [(leg, self.route_cache.get(self.provider(), *leg)) for leg in missing]
+            missing = [leg for leg, route in cached if route == None]
 
+            for leg, route in cached:
+                if route != None:
+                    self.routes.put(*leg, self.freeze(route))
 
-    def to_gpx(self, day):
-        """ Parses a route into an xml representation for the gpx file that defines the track 
+        if self.backend.remote:
+            groups = plan_requests(missing, self.backend.max_waypoints, self.backend.batch_size)
+            routes = self.fetcher.map(self.request_group, groups)
+        else:
+            size = max(1, ceil(len(missing) / (self.workers * 4)))
+            groups = [[missing[i:i + size]] for i in range(0, len(missing), size)]
+            routes = []
+
+            for group_routes, stats in self.executor.map(route_legs, groups):
+                self.merge_run_stats(stats)
+                routes.append(group_routes)
+
+        for group, group_routes in zip(groups, routes):
+            group_legs = [leg for chain in group for leg in chain]
+
+            for leg, route in zip(group_legs, group_routes):
+                if route == None:
+                    continue
+
+                if self.route_cache:
+                    self.route_cache.put(self.provider(), *leg, route['points'], route['distance'], route['duration'])
+
+                self.routes.put(*leg, self.freeze(route))
+
+        return len(missing), len(groups)
+
+    def to_track(self, day):
+        """ Converts a day's routes into a track in the selected output format
         Args:
             day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
         Returns:
-            string: xml that defines the route in the gpx format
+            string or bytes: the track, as it would be written to the day's file
         """
 
-        all_segments = self.get_segments(day)
+        track_writer = TRACK_WRITERS[self.output_format]
+        track = io.BytesIO() if track_writer.binary else io.StringIO()
+        writer = track_writer(track, day.date)
 
-        if (len(all_segments) == 0):
-            return ''
+        self.write_track(day, writer)
+        writer.close()
 
-        segments = ''.join([self.segment_gpx(segment) for segment in all_segments])
-        
-        return ''.join([
-            '<?xml version="1.0" encoding="UTF-8"?>\n',
-            f'<!-- {day.date} -->\n'
-            '<gpx xmlns="http://www.topografix.com/GPX/1/1">\n',
-            indentation(1) + '<trk>\n', 
-            segments,  
-            indentation(1) + '</trk>\n',
-            '</gpx>\n'
-        ])
+        return track.getvalue()
+
+    def write_track(self, day, writer):
+        """ Writes a day's routes to the current track of a writer, one at a time as they are calculated
+        Args:
+            day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
+            writer (:obj:`utils.track_writers.TrackWriter`): writer of the selected output format
+        """
+
+        stream_track(writer, self.timed_segments(day))
     
-    def LIFE_to_gpx(self):
-        """ Converts a file in the LIFE format into a file in the .gpx format describing a possible set of routes taken for each day
+    def days_with_routes(self):
+        """ Selects the days of the LIFE file that contain more than one location (in other words, contain at least one route)
+        Returns:
+            :obj:`list` of :obj:`life.Day`: days to convert
         """
-        for day in self.days:
-            # Checks if day contains more than one location (in other words, contains at least one route)
-            if len(day.all_places()) > 1:
-                self.generate_gpx_file(day)
+        return [day for day in self.days if len(day.all_places()) > 1]
+
+    def route_groups(self, days):
+        """ Splits days into groups whose routes fit in the in-memory route cache
+        Args:
+            days (:obj:`list` of :obj:`tuple`): solved location coordinates of the day's LIFE file and life.Day object of each day
+            (days without coordinates are copied from the previous output, they have no routes)
+        Yields:
+            :obj:`tuple`: days of each group (as given) and the origin and destination coordinates of their routes
+        """
+        group = []
+        legs = []
+
+        for locations, day in days:
+            self.locations = locations
+            day_legs = [(start, end) for start, end, start_time, end_time in self.get_legs(day)] if locations != None else []
+
+            if group and len(set(legs + day_legs)) > self.routes.max_routes:
+                yield group, legs
+                group = []
+                legs = []
+
+            group.append((locations, day))
+            legs += day_legs
 
-    def generate_gpx_file(self, day):
-        """ Creates a file in the gpx format that defines a day
+        if group:
+            yield group, legs
+
+    def output_name(self, life_file, day):
+        """
+        Args:
+            life_file (string): name of the day's LIFE file
+            day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
+        Returns:
+            string: name (without extension) of the file the day is written to: its date, the LIFE file's name or its month
+        """
+
+        if self.split == 'day':
+            return day.date.replace('_', '-')
+        elif self.split == 'file':
+            return os.path.splitext(life_file)[0]
+        else:
+            return day.date[:7].replace('_', '-')
+
+    def output_path(self, name):
+        """
+        Args:
+            name (string): name of the output file (without extension)
+        Returns:
+            string: path of the output file, in the selected output format
+        """
+        return join(expanduser(self.config['output_path']), f"{name}{TRACK_WRITERS[self.output_format].extension}")
+
+    def output_groups(self, files):
+        """ Groups the days to convert of every file by output file, per day, per LIFE file or per month. In incremental mode, the 
+        days that haven't changed are left out, unless they share a file with days that did, in which case they're copied from the 
+        previous file (and given no coordinates)
+        Args:
+            files (:obj:`list` of :obj:`tuple`): name, life.Life object and solved location coordinates of each LIFE file
+        Returns:
+            :obj:`list` of :obj:`tuple`: name of each output file and the solved location coordinates and life.Day object of its
+            days, in chronological order
+        """
+        groups = {}
+
+        for life_file, life, locations in files:
+            self.days = life.days
+
+            for day in self.days_with_routes():
+                name = self.output_name(life_file, day)
+                converted = self.incremental and self.is_converted(life_file, day)
+                self.day_outputs[day.date] = name
+
+                if converted and self.split == 'day':
+                    continue
+
+                groups.setdefault(name, []).append((None if converted else locations, day))
+
+        res = []
+
+        for name, days in groups.items():
+            previous = set([date for date, entry in self.manifest.items() if entry['output'] == name])
+
+            if all([locations == None for locations, day in days]) and previous == set([day.date for locations, day in days]):
+                continue
+
+            res.append((name, sorted(days, key=lambda entry: entry[1].date)))
+
+        return res
+
+    def day_hash(self, day):
+        """ Hashes what a day is converted from: its spans and timezones, the meta-commands about its places (coordinates, 
+        superplaces and name changes) and the settings that change the converted days
         Args:
             day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
+        Returns:
+            string: the hash
+        """
+
+        places = {}
+
+        for place in sorted(day.all_places()):
+            superplace = self.life.superplaces.get(place)
+            places[place] = [self.life.coordinates.get(place), superplace, self.life.coordinates.get(superplace), 
+                self.life.nameswaps.get(place), self.life.locationswaps.get(place)]
+
+        content = {
+            'date': day.date,
+            'spans': [[span.start, span.end, span.place, span.start_timezone, span.end_timezone] for span in day.spans],
+            'places': places,
+            'config': [self.config[key] for key in MANIFEST_CONFIG_KEYS] + [self.backend_name, self.output_format, self.split]
+        }
+
+        return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def is_converted(self, life_file, day, day_hash=None):
+        """
+        Args:
+            life_file (string): name of the day's LIFE file
+            day (:obj:`life.Day`): life.Day object that contains information about the date and the spans of a day 
+            day_hash (string, optional): the day's hash (the one of the days being converted by omission)
+        Returns:
+            bool: True if the day hasn't changed since it was last converted, to the same file, and the file still exists
+        """
+
+        entry = self.manifest.get(day.date)
+        day_hash = self.day_hashes[day.date] if day_hash == None else day_hash
+
+        return (entry != None and entry['hash'] == day_hash and entry['output'] == self.output_name(life_file, day) 
+            and isfile(self.output_path(entry['output'])))
+
+    def load_manifest(self):
+        """ Loads the manifest of the days converted by previous runs: the hash of each day (by date) and the file it's in, and 
+        the coordinates solved for each LIFE file (see `solve_locations`), if they were solved with the same settings
         """
-        date = day.date.replace('_', '-')
 
-        with open(f"{self.config['output_path']}\\{date}.gpx", "w+") as f:
-                f.write(self.to_gpx(day))
-                f.close()
+        path = join(expanduser(self.config['output_path']), MANIFEST_FILE)
+
+        if not isfile(path):
+            return
+
+        with open(path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        self.manifest = manifest.get('days', {}) # manifests without coordinates are left out, their days are converted again
+
+        if manifest.get('config') == [self.config[key] for key in SOLVER_CONFIG_KEYS]:
+            self.solved_locations.update({life_file: (entry['key'], entry['locations']) for life_file, entry in manifest.get('files', {}).items()})
+
+    def save_manifest(self, life_files):
+        """ Saves the manifest of the converted days and the coordinates solved for their LIFE files. Days with legs that 
+        couldn't be routed are left out, so they're converted again in the next run
+        Args:
+            life_files (:obj:`list` of string): names of the LIFE files converted
+        """
+
+        path = join(expanduser(self.config['output_path']), MANIFEST_FILE)
+        manifest = {
+            'config': [self.config[key] for key in SOLVER_CONFIG_KEYS],
+            'days': {date: {'hash': day_hash, 'output': self.day_outputs[date]} for date, day_hash in self.day_hashes.items() if date not in self.incomplete},
+            'files': {life_file: {'key': self.solved_locations[life_file][0], 'locations': self.solved_locations[life_file][1]} 
+                for life_file in life_files if life_file in self.solved_locations}
+        }
+
+        with open(f"{path}.tmp", 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+        os.replace(f"{path}.tmp", path)
+
+    def convert_outputs(self, outputs):
+        """ Routes, renders and writes the days of every output file, in 3 stages: days are routed in this process, in the order 
+        they are written; their routes are rendered in the output format by the worker processes (or in this process, if there's 
+        a single worker), with up to `render_ahead` days in flight so the memory they use is bounded; and the rendered days are 
+        written to their files in this process, in order. With a single worker, routes are rendered as they are written, straight
+        to the file (see `stream_track`), without keeping the rendered day in memory. Files with several days hold a track per day, and the byte range of 
+        each track is written to an index next to the file (`<file>.index.json`), so a single day can be read without parsing 
+        the whole file. Days without coordinates are copied from the previous file (see `output_groups`)
+        Args:
+            outputs (:obj:`list` of :obj:`tuple`): name of each output file and the solved location coordinates and life.Day object
+            of its days
+        """
+        rendering = deque()
+        max_rendering = self.config['render_ahead'] if self.executor else 0
+
+        for name, days in outputs:
+            # per day files are named after the day's date, as it's written in the LIFE file
+            document = days[0][1].date if self.split == 'day' else name
+
+            for group, legs in self.route_groups(days):
+                start = time.perf_counter()
+                self.prefetch_routes(legs)
+                self.stage_stats['routing'] += time.perf_counter() - start
+
+                for locations, day in group:
+                    track = day.date.replace('_', '-') if self.split != 'day' else None
+
+                    if locations == None:
+                        rendering.append((name, document, track, None))
+                        continue
+
+                    start = time.perf_counter()
+                    failed = self.leg_stats['failed']
+                    self.locations = locations
+                    segments = list(self.timed_segments(day))
+                    self.stage_stats['routing'] += time.perf_counter() - start
+
+                    if self.leg_stats['failed'] > failed:
+                        self.incomplete.add(day.date)
+
+                    if self.executor:
+                        rendering.append((name, document, track, self.executor.submit(render_track, self.output_format, track, segments)))
+                    else:
+                        rendering.append((name, document, track, segments))
+
+                    while len(rendering) > max_rendering:
+                        self.write_rendered(*rendering.popleft())
+
+        while rendering:
+            self.write_rendered(*rendering.popleft())
+
+        self.close_output()
+
+    def write_rendered(self, name, document, track, rendered):
+        """ Writes a rendered day to its output file, opening it if the day is the first one in it (and closing the previous one)
+        Args:
+            name (string): name of the output file (without extension)
+            document (string): name of the document in the output file
+            track (string): name of the day's track (None if the day is written to a file of its own)
+            rendered: the future of the worker rendering the day's routes (see `render_track`), the day's timed routes to stream 
+            to the file if there's a single worker (see `stream_track`), or None if the day is copied from the previous file
+        """
+
+        if self.executor and rendered != None:
+            start = time.perf_counter()
+            segments, seconds = rendered.result()
+            self.stage_stats['waiting'] += time.perf_counter() - start
+            self.stage_stats['rendering'] += seconds
+
+        start = time.perf_counter()
+
+        if self.output == None or self.output[0] != name:
+            self.close_output()
+            self.open_output(name, document)
+
+        writer = self.output[2]
+        writer.start_track(track)
+
+        if rendered == None:
+            if track in self.previous_tracks:
+                writer.copy_track(self.previous_tracks[track])
+        elif self.executor:
+            for pieces in segments:
+                writer.add_segment(pieces)
+
+        self.stage_stats['writing'] += time.perf_counter() - start
+
+        if rendered != None and not self.executor:
+            start = time.perf_counter()
+            stream_track(writer, rendered)
+            self.stage_stats['rendering'] += time.perf_counter() - start # routes are rendered and written together when streamed
+
+    def open_output(self, name, document):
+        """ Opens an output file in the selected output format (gpx by omission). The file is written under a temporary name, 
+        and replaces the previous one (whose tracks can be copied in incremental mode) once it's closed
+        Args:
+            name (string): name of the output file (without extension)
+            document (string): name of the document in the output file
+        """
+        track_writer = TRACK_WRITERS[self.output_format]
+        path = self.output_path(name)
+        output_file = track_writer.open(f"{path}.tmp")
+
+        self.previous_tracks = track_writer.read_tracks(path) if self.incremental and self.split != 'day' else {}
+        self.output = (name, path, track_writer(output_file, document), output_file)
+
+    def close_output(self):
+        """ Ends and closes the current output file, if any, and writes its index (if it has named tracks)
+        """
+
+        if self.output == None:
+            return
+
+        start = time.perf_counter()
+        name, path, writer, output_file = self.output
+
+        writer.close()
+        output_file.close()
+        os.replace(f"{path}.tmp", path)
+
+        if writer.index:
+            with open(f"{path}.index.json", 'w') as index_file:
+                json.dump(writer.index, index_file)
+        elif isfile(f"{path}.index.json"):
+            os.remove(f"{path}.index.json")
+
+        self.output = None
+        self.output_stats['bytes'] += os.path.getsize(path)
+        self.output_stats['files'] += 1
+        self.stage_stats['writing'] += time.perf_counter() - start
             
     
 if __name__=="__main__":
-    use_google_maps_api = args.use_google_maps_api
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument('--config', '-c', dest='config', metavar='c', type=str,
+            help='configuration file')
+    parser.add_argument('--backend', '-b', dest='backend', metavar='b', type=str, choices=list(BACKENDS),
+            help='routing backend (tomtom, google, mock or local)')
+    parser.add_argument('--google', '-g', dest='use_google_maps_api', metavar='g', type=bool,
+            help='use google maps api')
+    parser.add_argument('--local', '-l', dest='use_local_routing', action='store_true',
+            help='use the local routing engine')
+    parser.add_argument('--format', '-f', dest='output_format', metavar='f', type=str, choices=list(TRACK_WRITERS),
+            help='output format (gpx, gpx.gz, geojson or npz)')
+    parser.add_argument('--split', '-s', dest='split', metavar='s', type=str, choices=['day', 'file', 'month'],
+            help='write a file per day, per LIFE file or per month')
+    parser.add_argument('--incremental', '-i', dest='incremental', action='store_true',
+            help='only convert the days that changed since the last run, without moving the LIFE files')
+    parser.add_argument('--workers', '-w', dest='workers', metavar='w', type=int,
+            help='number of worker processes')
+    parser.add_argument('--watch', '-W', dest='watch', action='store_true',
+            help='keep running, converting LIFE files as they are added to the input directory or changed')
+    args = parser.parse_args()
+
+    backend = args.backend
+    output_format = args.output_format
+    incremental = args.incremental
+    split = args.split
     config_file = args.config
+    workers = args.workers
+
+    # --google and --local are shortcuts for --backend
+    if backend == None and args.use_local_routing:
+        backend = 'local'
+    elif backend == None and args.use_google_maps_api:
+        backend = 'google'
+
+    if workers == None:
+        workers = 1
+
+    if output_format == None:
+        output_format = 'gpx'
+
+    if split == None:
+        split = 'day'
 
-    if use_google_maps_api == None:
-        use_google_maps_api = False
+    converter = LIFEToTrackConverter(config_file, backend, output_format, split, incremental)
 
-    LIFEToTrackConverter(config_file, use_google_maps_api)
- 
\ No newline at end of file
+    if args.watch:
+        converter.watch(workers)
+    else:
+        converter.convert_files(workers)
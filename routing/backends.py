@@ -0,0 +1,353 @@
+from abc import ABC, abstractmethod
+from urllib.parse import urlencode
+
+import polyline
+
+from routing.local import LocalRouter
+
+class RoutingBackend(ABC):
+    """
+        Interface of the routing backends: remote backends (see `RemoteBackend`) build the HTTP requests sent by the converter 
+        (through its request scheduler) and parse their responses, in-process backends (see `InProcessBackend`) calculate routes
+        directly. Every backend returns routes as a dictionary with the route's points (list of latitude, longitude pairs),
+        distance (in metres), duration (in seconds) and the name of the backend that calculated it. Backends also give hints of
+        what their routes cost (`cost`, in dollars per 1000 requests) and how long they take (`latency`, in seconds per request),
+        which can be set in their settings, to compare them
+    """
+
+    name = None # used in the route cache and the scheduler's stats
+    title = None # printed when the backend is selected
+    config_key = None # section of the backend in the configuration's routing settings
+    api_key_config = None # configuration key with the backend's API key (None if it doesn't need one)
+    remote = None # False if routes are calculated in this process, so there's no request latency to hide
+    failover = () # names of the backends requests can fail over to
+    cost = 0 # price (in dollars) of 1000 requests
+    latency = 0 # usual number of seconds a request takes
+
+    def __init__(self, config, api_key=None):
+        """
+        Args:
+            config (:obj:`dict`): backend's routing settings
+            api_key (string, optional): backend's API key
+        """
+        self.config = config
+        self.api_key = api_key
+        self.max_waypoints = config.get('max_waypoints', 2)
+        self.batch_size = 0 # number of routes taken by a batch request (see `BatchBackend`)
+        self.cost = config.get('cost', self.cost)
+        self.latency = config.get('latency', self.latency)
+
+    def usage_report(self, requests):
+        """
+        Args:
+            requests (int): number of requests sent to the backend
+        Returns:
+            string: the requests, their estimated cost and the time they would take one at a time
+        """
+        title = self.title[0].upper() + self.title[1:] # titles are written to follow "Using"
+
+        return (f"{title}: {requests} requests, ~${requests * self.cost / 1000:.2f} (${self.cost:.2f} per 1000 requests), "
+            f"~{requests * self.latency:.1f}s of latency ({self.latency:.2f}s per request).")
+
+class RemoteBackend(RoutingBackend):
+    """
+        Routing API reached over HTTP. Its requests are sent by the converter, through its request scheduler, so they can be
+        sent concurrently, retried and failed over
+    """
+
+    remote = True
+
+    @abstractmethod
+    def route_request(self, locations, data_type='json'):
+        """ Builds the request for a route through some locations
+        Args:
+            locations (:obj:`list` of string): coordinates of the route's origin, waypoints and destination
+            data_type (string): string representing data type to be returned by the api
+        Returns:
+            :obj:`tuple`: method, url and JSON body (or None) of the request
+        """
+
+    @abstractmethod
+    def is_ok(self, response):
+        """
+        Args:
+            response (:obj:`dict`): parsed response to a route request
+        Returns:
+            bool: True if the response holds a route
+        """
+
+    @abstractmethod
+    def parse_points(self, response):
+        """ Parses points into a list of coordinate pairs
+        Args:
+            response (:obj:`dict`): parsed response to a route request
+        Returns:
+            :obj:`list`: of :obj:`tuple`: list of point coordinate pairs
+        """
+
+    @abstractmethod
+    def parse_distance_in_metres(self, response):
+        """
+        Args:
+            response (:obj:`dict`): parsed response to a route request
+        Returns:
+            float: distance in metres
+        """
+
+    @abstractmethod
+    def parse_duration_in_seconds(self, response):
+        """
+        Args:
+            response (:obj:`dict`): parsed response to a route request
+        Returns:
+            int: duration in seconds
+        """
+
+    @abstractmethod
+    def parse_legs(self, response, n_legs):
+        """ Parses the points, distance and duration of each leg of a route with waypoints
+        Args:
+            response (:obj:`dict`): parsed response to a route request
+            n_legs (int): number of legs in the route
+        Returns:
+            :obj:`list` of :obj:`dict`: route of each leg (None for all legs if the request wasn't successful)
+        """
+
+    def parse_route(self, response):
+        """
+        Args:
+            response (:obj:`dict`): parsed response to a route request without waypoints
+        Returns:
+            :obj:`dict`: the route, or None if the request wasn't successful
+        """
+
+        if not self.is_ok(response):
+            return None
+
+        return {
+            'points': self.parse_points(response), # points that describe the route
+            'distance': self.parse_distance_in_metres(response),
+            'duration': self.parse_duration_in_seconds(response),
+            'provider': self.name
+        }
+
+class BatchBackend(RemoteBackend):
+    """
+        Routing API that also takes several routes in a single batch request (if its batch_size is greater than 1)
+    """
+
+    def __init__(self, config, api_key=None):
+        RemoteBackend.__init__(self, config, api_key)
+        self.batch_size = config.get('batch_size', 0)
+
+    @abstractmethod
+    def batch_request(self, chains, data_type='json'):
+        """ Builds a single request for several routes
+        Args:
+            chains (:obj:`list` of :obj:`list` of string): locations of each route
+            data_type (string): string representing data type to be returned by the api
+        Returns:
+            :obj:`tuple`: method, url and JSON body of the request
+        """
+
+    @abstractmethod
+    def parse_batch(self, response, n_legs):
+        """ Parses the legs of each route of a batch request
+        Args:
+            response (:obj:`dict`): parsed response to a batch request
+            n_legs (:obj:`list` of int): number of legs of each route
+        Returns:
+            :obj:`list` of :obj:`dict`: route of each leg (None for the legs whose route failed)
+        """
+
+class InProcessBackend(RoutingBackend):
+    """
+        Routing engine that calculates routes in this process (or in the converter's worker processes), without requests
+    """
+
+    remote = False
+
+    @abstractmethod
+    def route(self, origin, destination):
+        """ Calculates a route
+        Args:
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+        Returns:
+            :obj:`dict`: the route
+        """
+
+    @abstractmethod
+    def report(self):
+        """
+        Returns:
+            string: the engine's stats, printed at the end of a run
+        """
+
+class TomTomBackend(BatchBackend):
+    """
+        Tom Tom Routing API, supporting waypoints and synchronous batch requests
+    """
+
+    name = 'tomtom'
+    title = 'Tom Tom Routing API'
+    config_key = 'tom_tom'
+    api_key_config = 'tom_tom_api_key'
+    failover = ('google',)
+
+    def params(self, params):
+        if self.api_key:
+            params["key"] = self.api_key
+        return params
+
+    def route_request(self, locations, data_type='json'):
+        endpoint = f"{self.config['url']}/routing/1/calculateRoute/{':'.join(locations)}/{data_type}"
+        params = self.params({"routeRepresentation": "polyline"})
+
+        return 'GET', f"{endpoint}?{urlencode(params)}", None
+
+    def batch_request(self, chains, data_type='json'):
+        endpoint = f"{self.config['url']}/routing/1/batch/sync/{data_type}"
+        items = [{"query": f"/calculateRoute/{':'.join(locations)}/{data_type}?routeRepresentation=polyline"} for locations in chains]
+
+        return 'POST', f"{endpoint}?{urlencode(self.params({}))}", {"batchItems": items}
+
+    def is_ok(self, response):
+        return 'routes' in response and 'detailedError' not in response and 'error' not in response
+
+    def parse_points(self, response):
+        return [(point['latitude'], point['longitude']) for point in response['routes'][0]['legs'][0]['points']]
+
+    def parse_distance_in_metres(self, response):
+        return response['routes'][0]['summary']['lengthInMeters']
+
+    def parse_duration_in_seconds(self, response):
+        return response['routes'][0]['summary']['travelTimeInSeconds']
+
+    def parse_legs(self, response, n_legs):
+        if not self.is_ok(response):
+            return [None] * n_legs
+
+        return [{
+            'points': [(point['latitude'], point['longitude']) for point in leg['points']],
+            'distance': leg['summary']['lengthInMeters'],
+            'duration': leg['summary']['travelTimeInSeconds'],
+            'provider': self.name
+        } for leg in response['routes'][0]['legs']]
+
+    def parse_batch(self, response, n_legs):
+        res = []
+
+        for n, item in zip(n_legs, response['batchItems']):
+            if item['statusCode'] in range(200, 299):
+                res += self.parse_legs(item['response'], n)
+            else:
+                res += [None] * n
+
+        return res
+
+class GoogleMapsBackend(RemoteBackend):
+    """
+        Google Maps Directions API, supporting waypoints
+    """
+
+    name = 'google'
+    title = 'Google Maps Directions API'
+    config_key = 'google_maps'
+    api_key_config = 'google_maps_api_key'
+    failover = ('tomtom',)
+
+    def route_request(self, locations, data_type='json'):
+        endpoint = f"{self.config['url']}/maps/api/directions/{data_type}"
+        params = {"origin": locations[0], "destination": locations[-1], "key":  self.api_key}
+        if len(locations) > 2:
+            params["waypoints"] = "|".join(locations[1:-1])
+
+        return 'GET', f"{endpoint}?{urlencode(params)}", None
+
+    def is_ok(self, response):
+        return response.get('status') == 'OK'
+
+    def parse_points(self, response):
+        return polyline.decode(response['routes'][0]['overview_polyline']['points'])
+
+    def parse_distance_in_metres(self, response):
+        return response['routes'][0]['legs'][0]['distance']['value']
+
+    def parse_duration_in_seconds(self, response):
+        return response['routes'][0]['legs'][0]['duration']['value']
+
+    def parse_legs(self, response, n_legs):
+        if not self.is_ok(response):
+            return [None] * n_legs
+
+        res = []
+
+        for leg in response['routes'][0]['legs']:
+            points = []
+
+            for step in leg['steps']:
+                step_points = polyline.decode(step['polyline']['points'])
+                if points and step_points and points[-1] == step_points[0]: # steps share their end and start points
+                    step_points = step_points[1:]
+                points += step_points
+
+            res.append({'points': points, 'distance': leg['distance']['value'], 'duration': leg['duration']['value'], 'provider': self.name})
+
+        return res
+
+class MockServerBackend(TomTomBackend):
+    """
+        Local mock routing server speaking the Tom Tom Routing API protocol (see `routing.mock_server`), used to benchmark the
+        converter without an API key or quota
+    """
+
+    name = 'mock'
+    title = 'the mock routing server'
+    config_key = 'mock'
+    api_key_config = None
+    failover = ()
+
+class LocalBackend(InProcessBackend):
+    """
+        Local routing engine, calculating routes in this process (see `routing.local.LocalRouter`)
+    """
+
+    name = 'local'
+    title = 'the local routing engine'
+    config_key = 'local'
+
+    def __init__(self, config, api_key=None):
+        InProcessBackend.__init__(self, config, api_key)
+        self.router = LocalRouter(config['graph_path'], config['speed'], config['step'])
+        self.stats = self.router.stats
+
+    def route(self, origin, destination):
+        return dict(self.router.route(origin, destination), provider=self.name)
+
+    def report(self):
+        return self.router.report()
+
+BACKENDS = {backend.name: backend for backend in (TomTomBackend, GoogleMapsBackend, MockServerBackend, LocalBackend)}
+
+def api_key(name, config):
+    """
+    Args:
+        name (string): backend's name
+        config (:obj:`dict`): converter's configuration
+    Returns:
+        string: the backend's API key ("" if it isn't set or the backend doesn't need one)
+    """
+    key_config = BACKENDS[name].api_key_config
+    return (config[key_config] or "") if key_config else ""
+
+def create_backend(name, config):
+    """ Creates a routing backend with its settings and API key from the converter's configuration
+    Args:
+        name (string): backend's name (tomtom, google, mock or local)
+        config (:obj:`dict`): converter's configuration
+    Returns:
+        :obj:`RoutingBackend`: the backend
+    """
+    backend = BACKENDS[name]
+    return backend(config['routing'][backend.config_key], api_key(name, config))
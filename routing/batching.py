@@ -0,0 +1,60 @@
+def unique_legs(legs):
+    """ Removes repeated legs, keeping the order in which they first appear
+    Args:
+        legs (:obj:`list` of :obj:`tuple`): origin and destination coordinates of each leg
+    Returns:
+        :obj:`list` of :obj:`tuple`: legs without repetitions
+    """
+    seen = set()
+    res = []
+
+    for leg in legs:
+        if leg not in seen:
+            seen.add(leg)
+            res.append(leg)
+
+    return res
+
+def chain_legs(legs, max_waypoints):
+    """ Joins consecutive legs where one ends where the next starts into chains that can be routed in a single request through
+    waypoints
+    Args:
+        legs (:obj:`list` of :obj:`tuple`): origin and destination coordinates of each leg, in the order they are travelled
+        max_waypoints (int): max number of locations (origin, waypoints and destination) a request can have
+    Returns:
+        :obj:`list` of :obj:`list` of :obj:`tuple`: chains of consecutive legs
+    """
+    chains = []
+
+    for leg in legs:
+        # a chain with n legs goes through n + 1 locations
+        if chains and chains[-1][-1][1] == leg[0] and len(chains[-1]) + 2 <= max_waypoints:
+            chains[-1].append(leg)
+        else:
+            chains.append([leg])
+
+    return chains
+
+def group_chains(chains, batch_size):
+    """ Groups chains that can be sent together in a single batch request
+    Args:
+        chains (:obj:`list` of :obj:`list` of :obj:`tuple`): chains of consecutive legs
+        batch_size (int): max number of chains in a batch request (chains aren't grouped if lower than 2)
+    Returns:
+        :obj:`list` of :obj:`list` of :obj:`list` of :obj:`tuple`: groups of chains, each one to be sent in a single request
+    """
+    if not batch_size or batch_size < 2:
+        return [[chain] for chain in chains]
+
+    return [chains[i:i + batch_size] for i in range(0, len(chains), batch_size)]
+
+def plan_requests(legs, max_waypoints=2, batch_size=0):
+    """ Plans the requests needed to route a list of legs
+    Args:
+        legs (:obj:`list` of :obj:`tuple`): origin and destination coordinates of each leg, in the order they are travelled
+        max_waypoints (int): max number of locations (origin, waypoints and destination) a request can have
+        batch_size (int): max number of chains in a batch request
+    Returns:
+        :obj:`list` of :obj:`list` of :obj:`list` of :obj:`tuple`: groups of chains, each one to be sent in a single request
+    """
+    return group_chains(chain_legs(unique_legs(legs), max_waypoints), batch_size)
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class RateLimiter(object):
+    """
+        Spaces out calls so that no more than a given number of them start per second, across threads
+    """
+
+    def __init__(self, requests_per_second=None):
+        """
+        Args:
+            requests_per_second (float, optional): max number of calls per second (unlimited if not set)
+        """
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """ Blocks until the next call is allowed to start
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+class RouteFetcher(object):
+    """
+        Sends routing requests concurrently, over a pool of keep-alive connections, respecting the provider's concurrency and 
+        rate limits. The concurrency limit holds for every request sent through the fetcher, including the ones sent by the
+        threads of other fetchers when requests fail over
+    """
+
+    def __init__(self, concurrency=4, requests_per_second=None, timeout=None):
+        """
+        Args:
+            concurrency (int): max number of requests in flight at once
+            requests_per_second (float, optional): max number of requests started per second (unlimited if not set)
+            timeout (float, optional): number of seconds to wait for the server to connect or send data before the request fails 
+            (waits forever if not set)
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.in_flight = threading.BoundedSemaphore(max(concurrency, 1))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.executor = None
+
+    def get(self, url):
+        """ Sends a GET request through the pooled session once the concurrency and rate limits allow it
+        Args:
+            url (string): request's url
+        Returns:
+            :obj:`requests.Response`: the request's response
+        """
+
+        with self.in_flight:
+            self.rate_limiter.wait()
+            return self.session.get(url, timeout=self.timeout)
+
+    def post(self, url, body):
+        """ Sends a POST request with a JSON body through the pooled session once the concurrency and rate limits allow it
+        Args:
+            url (string): request's url
+            body (:obj:`dict`): request's body
+        Returns:
+            :obj:`requests.Response`: the request's response
+        """
+
+        with self.in_flight:
+            self.rate_limiter.wait()
+            return self.session.post(url, json=body, timeout=self.timeout)
+
+    def request(self, method, url, body=None):
+        """ Sends a request through the pooled session once the concurrency and rate limits allow it
+        Args:
+            method (string): 'GET' or 'POST'
+            url (string): request's url
+            body (:obj:`dict`, optional): request's JSON body
+        Returns:
+            :obj:`requests.Response`: the request's response
+        """
+
+        if method == 'POST':
+            return self.post(url, body)
+
+        return self.get(url)
+
+    def map(self, function, items):
+        """ Applies a function that sends requests to every item, with up to `concurrency` calls running at once
+        Args:
+            function (function): function called for each item
+            items (:obj:`list`): items to process
+        Returns:
+            :obj:`list`: results, in the same order as the items
+        """
+
+        if self.concurrency <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+
+        if self.executor == None:
+            self.executor = ThreadPoolExecutor(self.concurrency)
+
+        return list(self.executor.map(function, items))
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+        self.session.close()
@@ -0,0 +1,215 @@
+import csv
+import heapq
+import time
+from functools import lru_cache
+from math import ceil
+from os.path import expanduser, getmtime
+
+import numpy as np
+
+from utils.bounds import great_circle_points, haversine
+
+class RoadGraph(object):
+    """
+        Road network loaded from an edge list file, where each line holds the coordinates of both ends of a road segment and,
+        optionally, its max speed (in km/h): `lat1,lng1,lat2,lng2[,max_speed]`. Segments can be travelled both ways
+    """
+
+    def __init__(self, path, speed=30):
+        """
+        Args:
+            path (string): path of the edge list file (lines that can't be parsed, like a header, are skipped)
+            speed (float): speed (in km/h) of the segments without a max speed
+        """
+        self.max_speed = speed / 3.6 # in m/s
+        nodes = {}
+        lats = []
+        lngs = []
+        edges = []
+
+        def node(lat, lng):
+            key = (round(lat, 7), round(lng, 7))
+            if key not in nodes:
+                nodes[key] = len(lats)
+                lats.append(lat)
+                lngs.append(lng)
+                edges.append([])
+            return nodes[key]
+
+        with open(expanduser(path), 'r', newline='') as edges_file:
+            for row in csv.reader(edges_file):
+                try:
+                    lat1, lng1, lat2, lng2 = map(float, row[:4])
+                    max_speed = float(row[4]) if len(row) > 4 and row[4] else speed
+                except (ValueError, IndexError):
+                    continue
+
+                start = node(lat1, lng1)
+                end = node(lat2, lng2)
+                distance = float(haversine(lat1, lng1, lat2, lng2)) * 1000
+                duration = distance / (max_speed / 3.6)
+
+                edges[start].append((end, distance, duration))
+                edges[end].append((start, distance, duration))
+                self.max_speed = max(self.max_speed, max_speed / 3.6)
+
+        self.lats = np.array(lats)
+        self.lngs = np.array(lngs)
+        self.edges = edges
+
+    def __len__(self):
+        return len(self.edges)
+
+    def nearest(self, lat, lng):
+        """
+        Args:
+            lat (float): latitude (in degrees)
+            lng (float): longitude (in degrees)
+        Returns:
+            int: index of the node closest to the coordinates
+        """
+        return int(np.argmin(haversine(self.lats, self.lngs, lat, lng)))
+
+    def shortest_path(self, source, target):
+        """ Finds the fastest path between 2 nodes (A* search, using the time to travel the straight line distance at the
+        graph's max speed as heuristic)
+        Args:
+            source (int): index of the path's first node
+            target (int): index of the path's last node
+        Returns:
+            :obj:`tuple`: indexes of the path's nodes and its duration (in seconds), or None if the target can't be reached
+        """
+
+        heuristic = haversine(self.lats, self.lngs, self.lats[target], self.lngs[target]) * 1000 / self.max_speed
+        durations = {source: 0}
+        previous = {}
+        visited = set()
+        queue = [(heuristic[source], 0, source)]
+
+        while queue:
+            estimate, duration, node = heapq.heappop(queue)
+
+            if node == target:
+                path = [node]
+                while path[-1] != source:
+                    path.append(previous[path[-1]])
+                return path[::-1], duration
+
+            if node in visited:
+                continue
+            visited.add(node)
+
+            for neighbor, distance, edge_duration in self.edges[node]:
+                new_duration = duration + edge_duration
+
+                if new_duration < durations.get(neighbor, float('inf')):
+                    durations[neighbor] = new_duration
+                    previous[neighbor] = node
+                    heapq.heappush(queue, (new_duration + heuristic[neighbor], new_duration, neighbor))
+
+        return None
+
+@lru_cache(maxsize=4)
+def cached_graph(path, speed, modified):
+    return RoadGraph(path, speed)
+
+def load_graph(path, speed=30):
+    """ Loads a road graph, reusing the one already loaded by this process unless the file changed since
+    Args:
+        path (string): path of the edge list file
+        speed (float): speed (in km/h) of the segments without a max speed
+    Returns:
+        :obj:`RoadGraph`: the road graph
+    """
+    return cached_graph(expanduser(path), speed, getmtime(expanduser(path)))
+
+class LocalRouter(object):
+    """
+        Calculates routes in-process, without any external API. Routes follow the fastest path over a road graph if one is
+        set, or a straight (great-circle) line between both locations otherwise
+    """
+
+    def __init__(self, graph_path=None, speed=30, step=50):
+        """
+        Args:
+            graph_path (string, optional): path of the road graph's edge list file
+            speed (float): speed (in km/h) used off the road graph
+            step (float): max distance (in metres) between the points of a straight line route
+        """
+        self.graph = load_graph(graph_path, speed) if graph_path else None
+        self.speed = speed / 3.6
+        self.step = step
+        self.stats = {'graph': 0, 'straight': 0, 'seconds': 0}
+
+    def route(self, origin, destination):
+        """
+        Args:
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+        Returns:
+            :obj:`dict`: route's points (list of latitude, longitude pairs), distance (in metres) and duration (in seconds)
+        """
+
+        start = time.perf_counter()
+        lat1, lng1 = map(float, origin.split(','))
+        lat2, lng2 = map(float, destination.split(','))
+
+        route = self.graph_route(lat1, lng1, lat2, lng2) if self.graph else None
+
+        if route == None:
+            route = self.straight_route(lat1, lng1, lat2, lng2)
+            self.stats['straight'] += 1
+        else:
+            self.stats['graph'] += 1
+
+        self.stats['seconds'] += time.perf_counter() - start
+
+        return route
+
+    def straight_route(self, lat1, lng1, lat2, lng2):
+        """ Interpolates a route along the great circle between 2 locations, travelled at the router's speed
+        Returns:
+            :obj:`dict`: route's points, distance (in metres) and duration (in seconds)
+        """
+
+        distance = float(haversine(lat1, lng1, lat2, lng2)) * 1000
+        lats, lngs = great_circle_points(lat1, lng1, lat2, lng2, max(1, ceil(distance / self.step)))
+
+        return {'points': list(zip(lats.tolist(), lngs.tolist())), 'distance': distance, 'duration': distance / self.speed}
+
+    def graph_route(self, lat1, lng1, lat2, lng2):
+        """ Routes between the graph's nodes closest to both locations, travelling straight from and to the locations
+        Returns:
+            :obj:`dict`: route's points, distance (in metres) and duration (in seconds), or None if the nodes aren't connected
+        """
+
+        found = self.graph.shortest_path(self.graph.nearest(lat1, lng1), self.graph.nearest(lat2, lng2))
+
+        if found == None:
+            return None
+
+        path, duration = found
+        lats = np.concatenate(([lat1], self.graph.lats[path], [lat2]))
+        lngs = np.concatenate(([lng1], self.graph.lngs[path], [lng2]))
+
+        steps = haversine(lats[:-1], lngs[:-1], lats[1:], lngs[1:]) * 1000
+        distance = float(steps.sum())
+        duration += float(steps[0] + steps[-1]) / self.speed
+
+        # drops the points that repeat the previous one (locations placed right on a node)
+        keep = np.concatenate(([True], steps > 0))
+
+        return {'points': list(zip(lats[keep].tolist(), lngs[keep].tolist())), 'distance': distance, 'duration': duration}
+
+    def report(self):
+        """ Formats the router's stats to be printed at the end of a run
+        Returns:
+            string: number of routes calculated over the road graph and in a straight line, and the time spent
+        """
+
+        stats = self.stats
+        routes = stats['graph'] + stats['straight']
+        rate = routes / stats['seconds'] if stats['seconds'] > 0 else 0
+
+        return (f"Local routing: {stats['graph']} routes over the road graph, {stats['straight']} in a straight line "
+            f"({stats['seconds']:.2f}s, {rate:.0f} routes/s).")
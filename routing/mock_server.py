@@ -0,0 +1,129 @@
+""" Local mock routing server speaking the Tom Tom Routing API protocol (route and synchronous batch requests), answering with
+straight line routes after a fixed latency. Used by the `mock` routing backend to benchmark the converter without an API key,
+and by the tests, which script failed responses to the first requests (see `create_server`)
+
+    $ python -m routing.mock_server [--port 8765] [--latency 0.05]
+"""
+
+import argparse, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from routing.local import LocalRouter
+
+def route_response(locations, router):
+    """ Builds a Tom Tom Routing API response for a route through some locations
+    Args:
+        locations (:obj:`list` of string): coordinates of the route's origin, waypoints and destination
+        router (:obj:`LocalRouter`): router that calculates each leg
+    Returns:
+        :obj:`dict`: the response
+    """
+
+    legs = []
+
+    for origin, destination in zip(locations, locations[1:]):
+        route = router.route(origin, destination)
+        legs.append({
+            'summary': {'lengthInMeters': round(route['distance']), 'travelTimeInSeconds': round(route['duration'])},
+            'points': [{'latitude': lat, 'longitude': lng} for lat, lng in route['points']]
+        })
+
+    summary = {
+        'lengthInMeters': sum(leg['summary']['lengthInMeters'] for leg in legs),
+        'travelTimeInSeconds': sum(leg['summary']['travelTimeInSeconds'] for leg in legs)
+    }
+
+    return {'routes': [{'summary': summary, 'legs': legs}]}
+
+def query_locations(query):
+    """
+    Args:
+        query (string): path (and query string) of a calculateRoute request
+    Returns:
+        :obj:`list` of string: coordinates of the route's locations
+    """
+    return unquote(urlparse(query).path).split('calculateRoute/')[1].split('/')[0].split(':')
+
+def create_server(port=8765, latency=0.05, router=None, faults=None):
+    """
+    Args:
+        port (int): port the server listens on (localhost only, 0 picks a free port)
+        latency (float): number of seconds each request takes to be answered
+        router (:obj:`LocalRouter`, optional): router that calculates the routes (straight lines by omission)
+        faults (:obj:`list` of :obj:`dict`, optional): how the first requests are answered, one at a time: the response's 
+        `status` (200 by omission), `headers` and `body` (the route by omission) and the extra seconds it takes (`delay`)
+    Returns:
+        :obj:`http.server.ThreadingHTTPServer`: the server, ready to `serve_forever`. The method and path of each request it 
+        receives are listed in its `requests` attribute
+    """
+
+    router = router or LocalRouter()
+    faults = list(faults or [])
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_fault(self):
+            """ Answers the request as scripted by the next fault, if any is left
+            Returns:
+                bool: True if the request was answered, False if it should get its route
+            """
+
+            with lock:
+                server.requests.append((self.command, self.path))
+                fault = faults.pop(0) if faults else {}
+
+            time.sleep(latency + fault.get('delay', 0))
+
+            if fault.get('status', 200) == 200 and fault.get('body') == None:
+                return False
+
+            body = fault.get('body', '').encode()
+            self.send_response(fault.get('status', 200))
+            for header, value in fault.get('headers', {}).items():
+                self.send_header(header, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+            return True
+
+        def do_GET(self):
+            if not self.send_fault():
+                self.send_json(route_response(query_locations(self.path), router))
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+            if not self.send_fault():
+                items = [{'statusCode': 200, 'response': route_response(query_locations(item['query']), router)} for item in body['batchItems']]
+                self.send_json({'batchItems': items})
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.requests = []
+
+    return server
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='mock routing server')
+    parser.add_argument('--port', '-p', dest='port', metavar='p', type=int, default=8765,
+            help='port to listen on')
+    parser.add_argument('--latency', '-l', dest='latency', metavar='l', type=float, default=0.05,
+            help='seconds each request takes to be answered')
+    args = parser.parse_args()
+
+    print(f"Mock routing server listening on http://127.0.0.1:{args.port}")
+    create_server(args.port, args.latency).serve_forever()
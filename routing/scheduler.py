@@ -0,0 +1,330 @@
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from os.path import expanduser
+
+import requests
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class CircuitBreaker(object):
+    """
+        Stops sending requests to a provider after too many consecutive failures, letting a single request through once
+        `reset_timeout` seconds have passed to check if it recovered
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=300):
+        """
+        Args:
+            failure_threshold (int): number of consecutive failures that opens the circuit
+            reset_timeout (float): number of seconds the circuit stays open before a request is let through again
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allows(self):
+        """
+        Returns:
+            bool: True if a request can be sent, False if the circuit is open
+        """
+        with self.lock:
+            if self.opened_at == None:
+                return True
+
+            # half-open: lets a request through, reopening the circuit for another timeout while it runs
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+
+            return False
+
+    def retry_in(self):
+        """
+        Returns:
+            float: number of seconds before a request can be sent (0 if the circuit is closed)
+        """
+        with self.lock:
+            if self.opened_at == None:
+                return 0
+
+            return max(self.opened_at + self.reset_timeout - time.monotonic(), 0)
+
+    def is_closed(self):
+        """
+        Returns:
+            bool: True if requests are being sent normally, False if the circuit is open or half-open
+        """
+        with self.lock:
+            return self.opened_at == None
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class DailyQuota(object):
+    """
+        Counts the requests sent to a provider during the current (UTC) day. If a path is given, counts are kept in a SQLite
+        database, so they are shared between worker processes and runs
+    """
+
+    def __init__(self, provider, limit=None, path=None):
+        """
+        Args:
+            provider (string): name of the provider
+            limit (int, optional): max number of requests per day (unlimited if not set)
+            path (string, optional): path of the SQLite database file where counts are kept
+        """
+        self.provider = provider
+        self.limit = limit
+        self.day = None
+        self.used = 0
+        self.lock = threading.Lock()
+        self.connection = None
+
+        if path:
+            self.connection = sqlite3.connect(expanduser(path), timeout=30, check_same_thread=False)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS quota (provider TEXT NOT NULL, day TEXT NOT NULL, used INTEGER NOT NULL, PRIMARY KEY (provider, day))')
+            self.connection.commit()
+
+    def allows(self, cost=1):
+        """
+        Args:
+            cost (int): number of requests the provider will count
+        Returns:
+            bool: True if there's enough quota left for a request, without reserving it
+        """
+        with self.lock:
+            today = datetime.now(timezone.utc).date().isoformat()
+            used = self.used if today == self.day else 0
+
+            if self.connection != None:
+                row = self.connection.execute('SELECT used FROM quota WHERE provider = ? AND day = ?', (self.provider, today)).fetchone()
+                used = row[0] if row else 0
+
+            return self.limit == None or used + cost <= self.limit
+
+    def reserve(self, cost=1):
+        """ Reserves part of the quota for a request
+        Args:
+            cost (int): number of requests the provider will count
+        Returns:
+            bool: True if there was enough quota left, False otherwise
+        """
+        with self.lock:
+            today = datetime.now(timezone.utc).date().isoformat()
+            if today != self.day:
+                self.day = today
+                self.used = 0
+
+            if self.connection == None:
+                if self.limit != None and self.used + cost > self.limit:
+                    return False
+
+                self.used += cost
+                return True
+
+            self.connection.execute('INSERT OR IGNORE INTO quota VALUES (?, ?, 0)', (self.provider, today))
+            updated = self.connection.execute(
+                'UPDATE quota SET used = used + ? WHERE provider = ? AND day = ? AND (? IS NULL OR used + ? <= ?)',
+                (cost, self.provider, today, self.limit, cost, self.limit)
+            ).rowcount
+            self.connection.commit()
+
+            if updated:
+                self.used += cost
+
+            return updated > 0
+
+    def release(self, cost=1):
+        """ Gives back quota reserved for a request the provider rejected without counting it
+        Args:
+            cost (int): number of requests reserved
+        """
+        with self.lock:
+            self.used -= cost
+
+            if self.connection != None:
+                self.connection.execute('UPDATE quota SET used = used - ? WHERE provider = ? AND day = ?', (cost, self.provider, self.day))
+                self.connection.commit()
+
+class RequestScheduler(object):
+    """
+        Sends requests to the first available provider, retrying failed requests with jittered exponential backoff (or after
+        the delay set in the response's Retry-After header) and failing over to the next provider once a provider's circuit
+        breaker opens or its daily quota runs out. If every provider's circuit breaker is open, requests wait until one of them
+        lets a request through, so they are only given up after `max_retries` retries or once the quotas run out. Requests that time out, and successful responses whose body isn't valid JSON,
+        are retried like the ones that fail
+    """
+
+    def __init__(self, providers, max_retries=5, backoff_base=1, backoff_max=60, failure_threshold=5, reset_timeout=300, quota_path=None):
+        """
+        Args:
+            providers (:obj:`list` of :obj:`tuple`): name, fetcher and daily quota limit of each provider, by order of preference
+            max_retries (int): max number of times a request is retried
+            backoff_base (float): delay (in seconds) before the first retry
+            backoff_max (float): max delay (in seconds) between retries
+            failure_threshold (int): number of consecutive failures that opens a provider's circuit breaker
+            reset_timeout (float): number of seconds a provider's circuit breaker stays open
+            quota_path (string, optional): path of the SQLite database file where daily quota counts are kept
+        """
+        self.providers = [name for name, fetcher, quota in providers]
+        self.fetchers = {name: fetcher for name, fetcher, quota in providers}
+        self.quotas = {name: DailyQuota(name, quota, quota_path) for name, fetcher, quota in providers}
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name, fetcher, quota in providers}
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.random = random.Random() # kept apart from the global generator used to place locations
+
+        self.stats = {'requests': 0, 'retries': 0, 'failovers': 0, 'failures': 0, 'invalid': 0}
+        self.sent = {name: 0 for name in self.providers} # requests sent to each provider (each item of a batch counts as one)
+        self.lock = threading.Lock()
+
+    def available_provider(self, providers, cost):
+        """ Picks the first provider whose circuit is closed and that has enough quota left
+        Args:
+            providers (:obj:`list` of string): names of the providers that can handle the request
+            cost (int): number of requests the provider will count
+        Returns:
+            string: the provider's name, or None if no provider is available
+        """
+
+        for provider in providers:
+            if self.breakers[provider].allows() and self.quotas[provider].reserve(cost):
+                return provider
+
+        return None
+
+    def wait_for_provider(self, providers, cost):
+        """ Waits for the circuit breaker of a provider with quota left to let a request through, when none is available
+        Args:
+            providers (:obj:`list` of string): names of the providers that can handle the request
+            cost (int): number of requests the provider will count
+        Returns:
+            string: the provider's name, or None if no provider has quota left
+        """
+
+        while True:
+            delays = [self.breakers[provider].retry_in() for provider in providers if self.quotas[provider].allows(cost)]
+
+            if not delays:
+                return None
+
+            # checked at least every second, other requests may close the circuit sooner
+            time.sleep(min(min(delays), 1))
+            provider = self.available_provider(providers, cost)
+
+            if provider != None:
+                return provider
+
+    def send(self, build_request, cost=1, providers=None):
+        """ Sends a request, retrying and failing over between providers when needed
+        Args:
+            build_request (function): receives a provider's name and returns the method, url and JSON body (or None) of the request
+            cost (int): number of requests the provider will count
+            providers (:obj:`list` of string, optional): names of the providers that can handle the request (all by omission)
+        Returns:
+            :obj:`tuple`: name of the provider that answered, the response's status code and its parsed JSON body (None unless 
+            the request was successful), or (None, None, None) if the request couldn't be sent
+        """
+
+        providers = [provider for provider in self.providers if providers == None or provider in providers]
+        last_provider = None
+
+        for attempt in range(self.max_retries + 1):
+            provider = self.available_provider(providers, cost) or self.wait_for_provider(providers, cost)
+
+            if provider == None:
+                break
+
+            if last_provider != None:
+                self.count('retries' if provider == last_provider else 'failovers')
+
+            method, url, body = build_request(provider)
+            self.count('requests')
+
+            with self.lock:
+                self.sent[provider] += cost
+
+            try:
+                response = self.fetchers[provider].request(method, url, body)
+            except requests.RequestException:
+                response = None
+
+            if response != None and response.status_code in range(200, 299):
+                try:
+                    body = response.json()
+                    self.breakers[provider].record_success()
+                    return provider, response.status_code, body
+                except ValueError:
+                    self.count('invalid') # a truncated or garbled body, retried as if the request had failed
+            elif response != None and response.status_code not in RETRYABLE_STATUS_CODES:
+                self.breakers[provider].record_success()
+                return provider, response.status_code, None
+
+            self.breakers[provider].record_failure()
+            last_provider = provider
+
+            if response != None and response.status_code == 429:
+                self.quotas[provider].release(cost)
+
+            # waits before retrying, unless the next attempt will go to another provider
+            if attempt < self.max_retries and self.breakers[provider].is_closed():
+                time.sleep(self.retry_delay(response, attempt))
+
+        self.count('failures')
+
+        return None, None, None
+
+    def retry_delay(self, response, attempt):
+        """ Calculates how long to wait before retrying a request
+        Args:
+            response (:obj:`requests.Response`): response to the failed request (None if it wasn't answered)
+            attempt (int): number of the failed attempt (starting at 0)
+        Returns:
+            float: delay in seconds
+        """
+
+        retry_after = response.headers.get('Retry-After') if response != None else None
+
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                    return min(max(delay, 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+
+        # full jitter
+        return self.random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def report(self):
+        """ Formats the scheduler's stats to be printed at the end of a run
+        Returns:
+            string: number of requests, retries, failovers, failed requests and invalid responses, and the quota used by each provider
+        """
+
+        quotas = ', '.join(f"{provider}: {self.quotas[provider].used}" + (f"/{self.quotas[provider].limit}" if self.quotas[provider].limit else '') for provider in self.providers)
+
+        return (f"Routing requests: {self.stats['requests']} sent, {self.stats['retries']} retries, {self.stats['failovers']} failovers, "
+            f"{self.stats['failures']} failed, {self.stats['invalid']} invalid responses (daily quota used - {quotas}).")
@@ -0,0 +1,76 @@
+import os, random, sys, threading
+from os.path import abspath, dirname
+
+import pytest
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from routing.mock_server import create_server
+from life_to_track_converter import LIFEToTrackConverter
+
+LIFE = """@home @ 38.75, -9.2
+--{year}_01_01
+0000-0800: home
+0900-1200: work
+1230-1300: cafe
+1400-1800: work
+1900-2359: home
+
+--{year}_01_02
+0000-0800: home
+0900-1200: work [x]
+1230-1300: gym -> park
+1400-2359: home
+"""
+
+@pytest.fixture
+def start_server():
+    """ Starts mock routing servers (see `routing.mock_server.create_server`) on free ports, shut down at the end of the test
+    Returns:
+        function: receives the server's `faults` (and `latency`) and returns the server, with its url in the `url` attribute
+    """
+    servers = []
+
+    def start(faults=None, latency=0):
+        server = create_server(0, latency, faults=faults)
+        server.url = f'http://127.0.0.1:{server.server_port}'
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def mock_server(start_server):
+    return start_server()
+
+@pytest.fixture
+def convert_files(tmp_path):
+    """ Converts LIFE files (3 years of the same 2 days) with the same random seed, in a directory of their own for each run
+    Returns:
+        function: receives the configuration, backend, output format, split and number of workers, and returns the content of
+        each track file written, by name
+    """
+    runs = []
+
+    def convert(config, backend='mock', output_format='gpx', split='day', workers=1):
+        run = tmp_path / f'run{len(runs)}'
+        input_path, output_path = run / 'input', run / 'output'
+        os.makedirs(input_path)
+        os.makedirs(output_path)
+        runs.append(run)
+
+        for year in (2020, 2021, 2022):
+            (input_path / f'{year}.life').write_text(LIFE.format(year=year))
+
+        random.seed(1) # locations are placed at random
+        converter = LIFEToTrackConverter(dict(config, input_path=str(input_path), output_path=str(output_path)), backend, output_format, split)
+        converter.convert_files(workers)
+
+        return {name: (output_path / name).read_bytes() for name in sorted(os.listdir(output_path)) if not name.endswith('.life')}
+
+    return convert
@@ -0,0 +1,37 @@
+from routing.batching import chain_legs, group_chains, plan_requests
+
+A, B, C, D, E = 'a', 'b', 'c', 'd', 'e'
+
+def test_chain_legs_joins_consecutive_legs():
+    assert chain_legs([(A, B), (B, C), (D, E), (E, A)], 150) == [[(A, B), (B, C)], [(D, E), (E, A)]]
+
+def test_chain_legs_respects_max_waypoints():
+    assert chain_legs([(A, B), (B, C), (C, D)], 3) == [[(A, B), (B, C)], [(C, D)]]
+    assert chain_legs([(A, B), (B, C)], 2) == [[(A, B)], [(B, C)]]
+
+def test_group_chains():
+    chains = [[(A, B)], [(C, D)], [(E, A)]]
+
+    assert group_chains(chains, 2) == [[[(A, B)], [(C, D)]], [[(E, A)]]]
+    assert group_chains(chains, 0) == [[chain] for chain in chains]
+
+def test_plan_requests_routes_repeated_legs_once():
+    assert plan_requests([(A, B), (B, A), (A, B), (B, C)], 150, 0) == [[[(A, B), (B, A)]], [[(B, C)]]]
+
+def test_batched_chained_and_single_leg_requests_write_the_same_tracks(start_server, convert_files):
+    tracks = {}
+    requests = {}
+
+    for max_waypoints, batch_size in ((150, 100), (150, 0), (2, 0)):
+        server = start_server()
+        config = {'routing': {'mock': {'url': server.url, 'max_waypoints': max_waypoints, 'batch_size': batch_size}}}
+        tracks[max_waypoints, batch_size] = convert_files(config, split='month')
+        requests[max_waypoints, batch_size] = server.requests
+
+    assert tracks[150, 100] == tracks[150, 0] == tracks[2, 0]
+    assert [name for name in tracks[2, 0] if name.endswith('.gpx')] == ['2020-01.gpx', '2021-01.gpx', '2022-01.gpx']
+
+    # a batch, a request per chain and a request per leg
+    assert [method for method, path in requests[150, 100]] == ['POST']
+    assert 1 < len(requests[150, 0]) < len(requests[2, 0])
+    assert all(path.count(':') == 1 for method, path in requests[2, 0])
@@ -0,0 +1,81 @@
+import time
+
+from routing.fetcher import RateLimiter, RouteFetcher
+from routing.scheduler import RequestScheduler
+
+LOCATIONS = [f'38.{i:02d},-9.{i:02d}' for i in range(20)]
+
+def route_url(server, *locations):
+    return f"{server.url}/routing/1/calculateRoute/{':'.join(locations)}/json?routeRepresentation=polyline"
+
+def first_point(response):
+    point = response.json()['routes'][0]['legs'][0]['points'][0]
+    return f"{point['latitude']:.2f},{point['longitude']:.2f}"
+
+def test_map_keeps_the_order_of_the_items():
+    fetcher = RouteFetcher(concurrency=4)
+    # later items finish first
+    results = fetcher.map(lambda i: time.sleep((10 - i) / 100) or i, list(range(10)))
+    fetcher.close()
+
+    assert results == list(range(10))
+
+def test_map_answers_each_request_with_its_own_route(start_server):
+    server = start_server(latency=0.01)
+    fetcher = RouteFetcher(concurrency=4)
+
+    responses = fetcher.map(lambda origin: fetcher.get(route_url(server, origin, LOCATIONS[0])), LOCATIONS)
+    fetcher.close()
+
+    assert [first_point(response) for response in responses] == LOCATIONS
+    assert len(server.requests) == len(LOCATIONS)
+
+def test_concurrency_limit_holds_for_requests_sent_by_other_fetchers(start_server):
+    server = start_server(latency=0.1)
+    fetcher = RouteFetcher(concurrency=4)
+    failover = RouteFetcher(concurrency=1)
+    start = time.monotonic()
+
+    # the threads of the first fetcher send their requests through the second one, as when requests fail over
+    fetcher.map(lambda origin: failover.get(route_url(server, origin, LOCATIONS[0])), LOCATIONS[:4])
+    fetcher.close()
+    failover.close()
+
+    assert time.monotonic() - start >= 0.4
+
+def test_rate_limiter_spaces_out_calls():
+    rate_limiter = RateLimiter(requests_per_second=50)
+    start = time.monotonic()
+
+    for i in range(6):
+        rate_limiter.wait()
+
+    assert time.monotonic() - start >= 0.1
+
+def test_timed_out_request_is_retried(start_server):
+    server = start_server(faults=[{'delay': 1}])
+    scheduler = RequestScheduler([('mock', RouteFetcher(timeout=0.2), None)], backoff_base=0)
+
+    provider, status, body = scheduler.send(lambda provider: ('GET', route_url(server, *LOCATIONS[:2]), None))
+
+    assert (provider, status) == ('mock', 200)
+    assert len(body['routes'][0]['legs']) == 1
+    assert scheduler.stats['retries'] == 1
+
+def test_invalid_json_response_is_retried(start_server):
+    server = start_server(faults=[{'body': '{"routes": [{"summary"'}])
+    scheduler = RequestScheduler([('mock', RouteFetcher(), None)], backoff_base=0)
+
+    provider, status, body = scheduler.send(lambda provider: ('GET', route_url(server, *LOCATIONS[:3]), None))
+
+    assert (provider, status) == ('mock', 200)
+    assert len(body['routes'][0]['legs']) == 2
+    assert scheduler.stats['invalid'] == 1
+    assert scheduler.stats['requests'] == 2
+
+def test_client_error_is_not_retried(start_server):
+    server = start_server(faults=[{'status': 400}])
+    scheduler = RequestScheduler([('mock', RouteFetcher(), None)], backoff_base=0)
+
+    assert scheduler.send(lambda provider: ('GET', route_url(server, *LOCATIONS[:2]), None)) == ('mock', 400, None)
+    assert scheduler.stats['requests'] == 1
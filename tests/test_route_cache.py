@@ -0,0 +1,102 @@
+import time
+
+from routing.backends import MockServerBackend
+from utils.route_cache import MemoryRouteCache, RouteCache
+from utils.route_geometry import RouteGeometry
+
+POINTS = [(38.7, -9.1), (38.8, -9.2)]
+
+def test_hits_and_misses(tmp_path):
+    cache = RouteCache(str(tmp_path / 'routes.db'))
+    cache.put('mock', 'a', 'b', POINTS, 100, 10)
+
+    assert cache.get('mock', 'a', 'b') == {'points': POINTS, 'distance': 100, 'duration': 10}
+    assert cache.get('mock', 'b', 'a') == None
+    assert cache.get('tomtom', 'a', 'b') == None
+    assert cache.stats == {'hits': 1, 'misses': 2, 'expired': 0, 'evictions': 0}
+
+def test_routes_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = RouteCache(str(tmp_path / 'routes.db'), ttl=60)
+    cache.put('mock', 'a', 'b', POINTS, 100, 10)
+
+    now[0] += 60
+    assert cache.get('mock', 'a', 'b') != None
+
+    now[0] += 1
+    assert cache.get('mock', 'a', 'b') == None
+    assert cache.stats['expired'] == 1
+    assert cache.size() == 0
+
+def test_evicts_least_recently_used_routes_with_hits_not_flushed(tmp_path, monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = RouteCache(str(tmp_path / 'routes.db'), max_routes=2, flush_hits=100)
+
+    for destination in ('b', 'c'):
+        now[0] += 1
+        cache.put('mock', 'a', destination, POINTS, 100, 10)
+
+    now[0] += 1
+    cache.get('mock', 'a', 'b') # only kept in memory until the route is evicted
+    now[0] += 1
+    cache.put('mock', 'a', 'd', POINTS, 100, 10)
+
+    assert cache.get('mock', 'a', 'b') != None
+    assert cache.get('mock', 'a', 'c') == None
+    assert cache.stats['evictions'] == 1
+
+def test_replaced_routes_are_counted_once(tmp_path):
+    cache = RouteCache(str(tmp_path / 'routes.db'), max_routes=2)
+
+    for destination in ('b', 'b', 'c'):
+        cache.put('mock', 'a', destination, POINTS, 100, 10)
+
+    assert cache.n_routes == cache.size() == 2
+    assert cache.stats['evictions'] == 0
+
+    cache.put('mock', 'a', 'd', POINTS, 100, 10)
+    assert cache.n_routes == cache.size() == 2
+    assert cache.stats['evictions'] == 1
+
+def test_cached_routes_are_kept_between_runs(tmp_path, start_server, convert_files):
+    tracks = []
+    servers = []
+
+    for run in range(2):
+        server = start_server()
+        tracks.append(convert_files({'routing': {'mock': {'url': server.url}}, 'route_cache': {'path': str(tmp_path / 'routes.db')}}))
+        servers.append(server)
+
+    assert tracks[0] == tracks[1]
+    assert len(servers[0].requests) > 0
+    assert servers[1].requests == []
+
+def test_routes_requested_after_failing_over_are_kept_between_runs(tmp_path, start_server, convert_files, monkeypatch):
+    # routes are answered as if by the API failed over to
+    monkeypatch.setattr(MockServerBackend, 'name', 'other')
+    servers = []
+
+    for run in range(2):
+        server = start_server()
+        convert_files({'routing': {'mock': {'url': server.url}}, 'route_cache': {'path': str(tmp_path / 'routes.db')}})
+        servers.append(server)
+
+    assert len(servers[0].requests) > 0
+    assert servers[1].requests == []
+
+def test_memory_cache_touch_refreshes_the_lru_order():
+    cache = MemoryRouteCache(max_routes=2)
+    route = {'geometry': RouteGeometry.from_points(POINTS)}
+
+    cache.put('a', 'b', route)
+    cache.put('a', 'c', route)
+
+    assert cache.touch('a', 'b')
+    assert not cache.touch('a', 'd')
+
+    cache.put('a', 'd', route)
+    assert ('a', 'b') in cache
+    assert ('a', 'c') not in cache
+    assert cache.stats['hits'] == cache.stats['misses'] == 0
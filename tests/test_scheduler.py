@@ -0,0 +1,99 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+from routing.fetcher import RouteFetcher
+from routing.scheduler import RequestScheduler
+
+def route_request(*servers):
+    """
+    Args:
+        servers (:obj:`http.server.ThreadingHTTPServer`): mock routing server of each provider, by order of preference
+    Returns:
+        function: builds the request of a route between 2 locations for a provider (see `RequestScheduler.send`)
+    """
+    urls = {f'provider{i}': server.url for i, server in enumerate(servers)}
+    return lambda provider: ('GET', f"{urls[provider]}/routing/1/calculateRoute/38.7,-9.1:38.8,-9.2/json", None)
+
+def create_scheduler(*quotas, **settings):
+    """
+    Args:
+        quotas (int): daily quota of each provider (None for unlimited)
+        settings: other settings of the scheduler
+    Returns:
+        :obj:`RequestScheduler`: scheduler of the providers, without backoff between retries unless set
+    """
+    return RequestScheduler([(f'provider{i}', RouteFetcher(), quota) for i, quota in enumerate(quotas)], **dict({'backoff_base': 0}, **settings))
+
+def test_retry_after_delays_the_retry(start_server):
+    server = start_server(faults=[{'status': 429, 'headers': {'Retry-After': '0.3'}}])
+    scheduler = create_scheduler(None)
+    start = time.monotonic()
+
+    assert scheduler.send(route_request(server))[:2] == ('provider0', 200)
+    assert time.monotonic() - start >= 0.3
+    assert scheduler.stats['retries'] == 1
+
+def test_retry_after_http_date_and_backoff_max():
+    scheduler = create_scheduler(None, backoff_max=60)
+    in_30s = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+    assert 28 <= scheduler.retry_delay(SimpleNamespace(headers={'Retry-After': in_30s}), 0) <= 30
+    assert scheduler.retry_delay(SimpleNamespace(headers={'Retry-After': '3600'}), 0) == 60
+
+def test_circuit_breaker_fails_over_and_retries_the_provider_after_reset_timeout(start_server):
+    failing = start_server(faults=[{'status': 503}] * 2)
+    fallback = start_server()
+    scheduler = create_scheduler(None, None, failure_threshold=2, reset_timeout=0.3)
+
+    assert scheduler.send(route_request(failing, fallback))[:2] == ('provider1', 200)
+    assert scheduler.stats['retries'] == 1
+    assert scheduler.stats['failovers'] == 1
+
+    # the circuit is open, requests go straight to the other provider
+    assert scheduler.send(route_request(failing, fallback))[:2] == ('provider1', 200)
+    assert len(failing.requests) == 2
+
+    # once the reset timeout passes, a request is let through to the recovered provider
+    time.sleep(0.3)
+    assert scheduler.send(route_request(failing, fallback))[:2] == ('provider0', 200)
+    assert scheduler.breakers['provider0'].is_closed()
+
+def test_daily_quota_fails_over_and_stops_when_exhausted(start_server):
+    first, second = start_server(), start_server()
+    scheduler = create_scheduler(1, 1)
+
+    assert scheduler.send(route_request(first, second))[0] == 'provider0'
+    assert scheduler.send(route_request(first, second))[0] == 'provider1'
+    assert scheduler.send(route_request(first, second)) == (None, None, None)
+    assert scheduler.stats['failures'] == 1
+    assert len(first.requests) == len(second.requests) == 1
+
+def test_rate_limited_request_gives_back_its_quota(start_server):
+    server = start_server(faults=[{'status': 429, 'headers': {'Retry-After': '0'}}])
+    scheduler = create_scheduler(1)
+
+    assert scheduler.send(route_request(server))[:2] == ('provider0', 200)
+    assert scheduler.quotas['provider0'].used == 1
+
+def test_daily_quota_is_shared_through_its_database(start_server, tmp_path):
+    server = start_server()
+    quota_path = str(tmp_path / 'quota.db')
+
+    assert create_scheduler(1, quota_path=quota_path).send(route_request(server))[0] == 'provider0'
+    assert create_scheduler(1, quota_path=quota_path).send(route_request(server)) == (None, None, None)
+
+def test_single_provider_waits_for_its_circuit_breaker(start_server):
+    server = start_server(faults=[{'status': 503}] * 7)
+    scheduler = create_scheduler(None, max_retries=5, failure_threshold=5, reset_timeout=0.3)
+
+    # the 6th attempt is sent once the circuit breaker lets it through
+    assert scheduler.send(route_request(server)) == (None, None, None)
+    assert len(server.requests) == 6
+
+    start = time.monotonic()
+    assert scheduler.send(route_request(server))[:2] == ('provider0', 200)
+    assert time.monotonic() - start >= 0.3
+    assert len(server.requests) == 8
+    assert scheduler.stats['failures'] == 1
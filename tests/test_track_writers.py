@@ -0,0 +1,20 @@
+import io
+
+import pytest
+
+from utils.track_writers import TRACK_WRITERS, TrackWriter
+
+def test_incomplete_writer_fails_when_created():
+    class IncompleteWriter(TrackWriter):
+        extension = '.txt'
+
+        def add_segment(self, pieces):
+            self.write(''.join(pieces))
+
+    with pytest.raises(TypeError):
+        IncompleteWriter(io.StringIO(), 'incomplete')
+
+@pytest.mark.parametrize('output_format', sorted(TRACK_WRITERS))
+def test_writers_implement_every_method(output_format):
+    writer_class = TRACK_WRITERS[output_format]
+    assert not writer_class.__abstractmethods__
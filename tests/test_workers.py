@@ -0,0 +1,14 @@
+import pytest
+
+@pytest.mark.parametrize('backend, output_format, split', [
+    ('mock', 'gpx', 'month'),
+    ('mock', 'npz', 'day'),
+    ('local', 'geojson', 'file'),
+    ('local', 'gpx.gz', 'day')
+])
+def test_workers_write_the_same_files_as_a_single_process(mock_server, convert_files, backend, output_format, split):
+    config = {'routing': {'mock': {'url': mock_server.url}}}
+    tracks = convert_files(config, backend, output_format, split, workers=1)
+
+    assert len(tracks) > 0
+    assert convert_files(config, backend, output_format, split, workers=3) == tracks
@@ -1,5 +1,6 @@
 from math import radians, cos, sin, asin, acos, pi, degrees
 from rtreelib import Rect #might be able to implement on my own in location_coords
+import numpy as np
  
 '''
 TODO give credit to sources 
@@ -149,3 +150,193 @@ def is_point_in_bounds(point, bounds):
     lng = point['lng']
 
     return (lat > min_lat and max_lat > lat) and (lng > min_lng and max_lng > lng)
+
+
+'''
+Array-in/array-out versions of the operations above. Boxes are represented as rows of a (n, 4) array
+holding [min_lat, min_lng, max_lat, max_lng] (in degrees), which avoids allocating a Rect per call.
+'''
+
+def haversine(lat1, lng1, lat2, lng2, radius=EARTH_RADIUS):
+    ''' Calculates the great-circle distances between pairs of points (haversine formula)
+    Args:
+        lat1 (:obj:`numpy.ndarray`:): latitudes of the first points (in degrees)
+        lng1 (:obj:`numpy.ndarray`:): longitudes of the first points (in degrees)
+        lat2 (:obj:`numpy.ndarray`:): latitudes of the second points (in degrees)
+        lng2 (:obj:`numpy.ndarray`:): longitudes of the second points (in degrees)
+        radius (float): sphere's radius
+    Returns:
+        :obj:`numpy.ndarray`: distances between each pair of points (in km)
+    '''
+
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+
+    return 2 * radius * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def polyline_distances(lats, lngs, radius=EARTH_RADIUS):
+    ''' Calculates the length of each step of a polyline
+    Args:
+        lats (:obj:`numpy.ndarray`:): latitudes of the polyline's points (in degrees)
+        lngs (:obj:`numpy.ndarray`:): longitudes of the polyline's points (in degrees)
+        radius (float): sphere's radius
+    Returns:
+        :obj:`numpy.ndarray`: n - 1 distances between consecutive points (in km)
+    '''
+
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+
+    return haversine(lats[:-1], lngs[:-1], lats[1:], lngs[1:], radius)
+
+def cumulative_distances(lats, lngs, radius=EARTH_RADIUS):
+    ''' Calculates the distance travelled along a polyline up to each of its points
+    Args:
+        lats (:obj:`numpy.ndarray`:): latitudes of the polyline's points (in degrees)
+        lngs (:obj:`numpy.ndarray`:): longitudes of the polyline's points (in degrees)
+        radius (float): sphere's radius
+    Returns:
+        :obj:`numpy.ndarray`: n distances from the first point (in km), starting at 0
+    '''
+
+    steps = polyline_distances(lats, lngs, radius)
+
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+def bounding_boxes(lats, lngs, distances, radius=EARTH_RADIUS):
+    ''' Batched version of `bounding_locations` followed by `bounding_box`
+    Args:
+        lats (:obj:`numpy.ndarray`:): points' latitudes (in degrees)
+        lngs (:obj:`numpy.ndarray`:): points' longitudes (in degrees)
+        distances (:obj:`numpy.ndarray`:): distance (in km) to analyse for each point
+        radius (float): sphere's radius
+    Returns:
+        :obj:`numpy.ndarray`: (n, 4) array of boxes with the points within a certain distance from each point
+    '''
+
+    lats, lngs, distances = np.broadcast_arrays(np.radians(lats), np.radians(lngs), np.asarray(distances, dtype=float))
+
+    if radius < 0 or np.any(distances < 0) or np.any((lats < MIN_LAT) | (lats > MAX_LAT) | (lngs < MIN_LNG) | (lngs > MAX_LNG)):
+        raise Exception("Illegal arguments")
+
+    # angular distance in radians on a great circle
+    rad_dist = distances / radius
+
+    min_lat = lats - rad_dist
+    max_lat = lats + rad_dist
+
+    inside = (min_lat > MIN_LAT) & (max_lat < MAX_LAT)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta_lng = np.arcsin(np.sin(rad_dist) / np.cos(lats))
+
+    min_lng = lngs - delta_lng
+    min_lng = np.where(min_lng < MIN_LNG, min_lng + 2 * pi, min_lng)
+    max_lng = lngs + delta_lng
+    max_lng = np.where(max_lng > MAX_LNG, max_lng - 2 * pi, max_lng)
+
+    # a pole is within the distance
+    min_lat = np.where(inside, min_lat, np.maximum(min_lat, MIN_LAT))
+    max_lat = np.where(inside, max_lat, np.minimum(max_lat, MAX_LAT))
+    min_lng = np.where(inside, min_lng, MIN_LNG)
+    max_lng = np.where(inside, max_lng, MAX_LNG)
+
+    corners = np.degrees(np.stack((min_lat, min_lng, max_lat, max_lng), axis=-1))
+
+    return normalize_boxes(corners)
+
+def normalize_boxes(boxes):
+    ''' Orders the corners of each box so that the minimums come first
+    Args:
+        boxes (:obj:`numpy.ndarray`:): (n, 4) array of boxes defined by two opposite corners
+    Returns:
+        :obj:`numpy.ndarray`: (n, 4) array of [min_lat, min_lng, max_lat, max_lng] boxes
+    '''
+
+    boxes = np.asarray(boxes, dtype=float)
+    lat = boxes[..., 0::2]
+    lng = boxes[..., 1::2]
+
+    return np.stack((lat.min(axis=-1), lng.min(axis=-1), lat.max(axis=-1), lng.max(axis=-1)), axis=-1)
+
+def bounds_to_box(bounds):
+    ''' Converts a pair of coordinates into a box row
+    Args:
+        bounds(:obj:`tuple`: of :obj:`dict`:): pair of coordinates that define the bounds
+    Returns:
+        :obj:`numpy.ndarray`: [min_lat, min_lng, max_lat, max_lng] box
+    '''
+
+    return normalize_boxes([bounds[0]['lat'], bounds[0]['lng'], bounds[1]['lat'], bounds[1]['lng']])
+
+def boxes_intersection(boxes1, boxes2, normalized=False):
+    ''' Batched version of `bounds_intersection`, keeping the second box wherever the pair doesn't overlap
+    Args:
+        boxes1 (:obj:`numpy.ndarray`:): (n, 4) array with the first boxes
+        boxes2 (:obj:`numpy.ndarray`:): (n, 4) array with the second boxes
+        normalized (bool): if True, the boxes are already [min_lat, min_lng, max_lat, max_lng] boxes (as returned by the 
+        functions in this section) and aren't normalized again
+    Returns:
+        :obj:`numpy.ndarray`: (n, 4) array with the intersection of each pair of boxes
+    '''
+
+    if not normalized:
+        boxes1 = normalize_boxes(boxes1)
+        boxes2 = normalize_boxes(boxes2)
+
+    intersection = np.concatenate((np.maximum(boxes1[..., :2], boxes2[..., :2]), np.minimum(boxes1[..., 2:], boxes2[..., 2:])), axis=-1)
+    overlaps = (intersection[..., 0] < intersection[..., 2]) & (intersection[..., 1] < intersection[..., 3])
+
+    return np.where(overlaps[..., None], intersection, boxes2)
+
+def points_in_boxes(lats, lngs, boxes, normalized=False):
+    ''' Batched version of `is_point_in_bounds`
+    Args:
+        lats (:obj:`numpy.ndarray`:): points' latitudes (in degrees)
+        lngs (:obj:`numpy.ndarray`:): points' longitudes (in degrees)
+        boxes (:obj:`numpy.ndarray`:): (n, 4) array with the box each point is tested against
+        normalized (bool): if True, the boxes are already [min_lat, min_lng, max_lat, max_lng] boxes and aren't normalized again
+    Returns:
+        :obj:`numpy.ndarray`: of bool, True where the point is strictly inside its box
+    '''
+
+    if not normalized:
+        boxes = normalize_boxes(boxes)
+
+    return (lats > boxes[..., 0]) & (boxes[..., 2] > lats) & (lngs > boxes[..., 1]) & (boxes[..., 3] > lngs)
+
+def great_circle_points(lat1, lng1, lat2, lng2, n):
+    ''' Interpolates points along the great circle between 2 points
+    Args:
+        lat1 (float): first point's latitude (in degrees)
+        lng1 (float): first point's longitude (in degrees)
+        lat2 (float): second point's latitude (in degrees)
+        lng2 (float): second point's longitude (in degrees)
+        n (int): number of steps between both points
+    Returns:
+        :obj:`tuple`: of :obj:`numpy.ndarray`: latitudes and longitudes of the n + 1 points (in degrees), including both ends
+    '''
+
+    ends = (lat1, lng1, lat2, lng2)
+    lat1, lng1, lat2, lng2 = map(np.radians, ends)
+
+    # unit vectors of both points
+    start = np.array([np.cos(lat1) * np.cos(lng1), np.cos(lat1) * np.sin(lng1), np.sin(lat1)])
+    end = np.array([np.cos(lat2) * np.cos(lng2), np.cos(lat2) * np.sin(lng2), np.sin(lat2)])
+
+    fractions = np.linspace(0, 1, n + 1)[:, None]
+    angle = np.arccos(np.clip(np.dot(start, end), -1, 1))
+
+    if angle < 1e-12:
+        vectors = start + fractions * (end - start)
+    else:
+        vectors = (np.sin((1 - fractions) * angle) * start + np.sin(fractions * angle) * end) / np.sin(angle)
+
+    lats = np.degrees(np.arctan2(vectors[:, 2], np.hypot(vectors[:, 0], vectors[:, 1])))
+    lngs = np.degrees(np.arctan2(vectors[:, 1], vectors[:, 0]))
+
+    # keeps both ends exact
+    lats[0], lngs[0], lats[-1], lngs[-1] = ends
+
+    return lats, lngs
@@ -19,9 +19,70 @@ CONFIG = {
     },
     "avg_speed": 10, # speed used to determine bounds of possible points
     "bounds_iterations": 100, # number of iterations the algorithm will try to tighten possible point bounds
+    "simplify_tolerance": None, # max distance (in metres) between a route and its simplified version, routes aren't simplified if not set
+    "render_ahead": 64, # max number of days rendered by the worker processes ahead of the day being written (bounds the memory they use)
+    "watch_interval": 5, # seconds between polls of the input directory in watch mode
+    "watch_retries": 3, # times a file that fails to convert is tried in watch mode before it's left alone until it changes
+    "routing": { # settings of each routing backend: base urls and the limits used when requesting routes concurrently
+        "tom_tom": {
+            "url": "https://api.tomtom.com",
+            "concurrency": 4, # max number of requests in flight at once
+            "requests_per_second": 5, # max number of requests started per second (unlimited if not set)
+            "max_waypoints": 150, # max number of locations in a request, consecutive legs are routed through waypoints (2 disables it)
+            "batch_size": 100, # max number of requests grouped in a batch request (0 disables batching)
+            "daily_quota": None, # max number of requests per day (unlimited if not set)
+            "timeout": 30, # seconds to wait for the API to connect or send data before the request is retried (waits forever if not set)
+            "cost": 0.5, # price (in dollars) of 1000 requests, used to estimate what a run costs
+            "latency": 0.3 # usual number of seconds a request takes
+        },
+        "google_maps": {
+            "url": "https://maps.googleapis.com",
+            "concurrency": 4,
+            "requests_per_second": 50,
+            "max_waypoints": 27,
+            "batch_size": 0, # batch requests aren't supported by Google
+            "daily_quota": None,
+            "timeout": 30,
+            "cost": 5,
+            "latency": 0.3
+        },
+        "mock": { # local mock routing server (python -m routing.mock_server), used with --backend mock to benchmark without an API key
+            "url": "http://127.0.0.1:8765",
+            "concurrency": 4,
+            "requests_per_second": None,
+            "max_waypoints": 150,
+            "batch_size": 100,
+            "daily_quota": None,
+            "timeout": 30,
+            "cost": 0,
+            "latency": 0.05
+        },
+        "local": { # routing engine used when no API key is set (or --local is used)
+            "graph_path": None, # edge list file (lat1,lng1,lat2,lng2[,max_speed] per line) with the road graph, routes are straight lines if not set
+            "speed": 30, # speed (in km/h) of the roads without a max speed and of the straight line routes
+            "step": 50 # max distance (in metres) between the points of a straight line route
+        },
+        "scheduler": { # retries and failover between APIs when requests fail
+            "max_retries": 5, # max number of times a failed request (429, 5xx or connection error) is retried
+            "backoff_base": 1, # delay (in seconds) before the first retry, doubled on each retry (with random jitter) unless the API sets Retry-After
+            "backoff_max": 60, # max delay (in seconds) between retries
+            "failure_threshold": 5, # consecutive failures after which requests fail over to the other API (if its key is set, or wait for reset_timeout)
+            "reset_timeout": 300, # number of seconds before a failing API is tried again
+            "quota_path": None # SQLite database file where daily quota counts are kept between runs and worker processes (kept in memory if not set)
+        }
+    },
+    "route_cache": { # caches of the routes requested to the routing APIs
+        "memory_max_routes": 1000, # max number of routes kept in memory during a run, least recently used routes are evicted first
+        "path": None, # SQLite database file where routes are stored (cache is disabled if not set)
+        "max_routes": 10000, # max number of stored routes, least recently used routes are evicted first
+        "ttl": None, # number of seconds a stored route stays valid (never expires if not set)
+        "flush_hits": 100 # number of hits after which the time routes were last used is written to the database
+    },
     "life_generator": { # configuration for the LIFE file generator script
         "locations_csv": None, # csv file with the locations that will be used to generate the LIFE file
         "header_path": None, # input file with the meta commands that can be placed in the LIFE file's header
-        "output_path": None
+        "output_path": None,
+        "batch_days": 1000, # number of days generated at once
+        "profile": "uniform" # workload profile (uniform or realistic, see PROFILES in life_generator.py), or its settings
     }
 }
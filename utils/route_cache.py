@@ -0,0 +1,261 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from os.path import expanduser
+
+class MemoryRouteCache(object):
+    """
+        In-process route cache keyed by origin and destination, evicting the least recently used route once it grows past
+        its size bound
+    """
+
+    def __init__(self, max_routes=1000):
+        """
+        Args:
+            max_routes (int): max number of routes kept in the cache
+        """
+        self.max_routes = max_routes
+        self.routes = OrderedDict()
+        self.nbytes = 0 # size of the cached routes' geometry
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __contains__(self, leg):
+        return leg in self.routes
+
+    def get(self, origin, destination):
+        """ Looks up a route, refreshing its position in the LRU order
+        Args:
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+        Returns:
+            :obj:`dict`: route's geometry, distance (in metres) and duration (in seconds), or None if the route isn't cached
+        """
+
+        route = self.routes.get((origin, destination))
+
+        if route == None:
+            self.stats['misses'] += 1
+            return None
+
+        self.routes.move_to_end((origin, destination))
+        self.stats['hits'] += 1
+
+        return route
+
+    def peek(self, origin, destination):
+        """ Looks up a route without counting the lookup or refreshing its position in the LRU order
+        Args:
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+        Returns:
+            :obj:`dict`: the route, or None if the route isn't cached
+        """
+        return self.routes.get((origin, destination))
+
+    def touch(self, origin, destination):
+        """ Refreshes a route's position in the LRU order without counting a lookup, so a route that will be needed soon isn't
+        evicted first
+        Args:
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+        Returns:
+            bool: True if the route is cached, False otherwise
+        """
+
+        if (origin, destination) not in self.routes:
+            return False
+
+        self.routes.move_to_end((origin, destination))
+
+        return True
+
+    def put(self, origin, destination, route):
+        """ Stores a route, evicting the least recently used routes if the cache is full
+        Args:
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+            route (:obj:`dict`): route's geometry (`utils.route_geometry.RouteGeometry`), distance (in metres) and duration (in seconds)
+        """
+
+        if (origin, destination) in self.routes:
+            self.nbytes -= self.routes[(origin, destination)]['geometry'].nbytes
+
+        self.routes[(origin, destination)] = route
+        self.routes.move_to_end((origin, destination))
+        self.nbytes += route['geometry'].nbytes
+
+        while len(self.routes) > self.max_routes:
+            leg, evicted = self.routes.popitem(last=False)
+            self.nbytes -= evicted['geometry'].nbytes
+            self.stats['evictions'] += 1
+
+    def report(self):
+        """ Formats the cache's stats to be printed at the end of a run
+        Returns:
+            string: hits, misses, hit rate and evicted routes, and the cache's current size and memory used per route
+        """
+
+        stats = self.stats
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = 100 * stats['hits'] / lookups if lookups > 0 else 0
+        route_size = self.nbytes / len(self.routes) if len(self.routes) > 0 else 0
+
+        return (f"Memory route cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hit rate), "
+            f"{stats['evictions']} evicted, {len(self.routes)} routes cached ({self.nbytes / 1024:.1f} KB, {route_size:.0f} bytes per route).")
+
+class RouteCache(object):
+    """
+        Persistent route cache stored in a SQLite database. Routes are keyed by provider, origin and destination, and the
+        least recently used ones are evicted once the cache grows past its size bound. Lookups don't write to the database: the 
+        time each route was last used is kept in memory and written every `flush_hits` hits, before routes are evicted and when 
+        the cache is flushed or closed. The number of routes is also kept in memory, so storing a route doesn't count them
+    """
+
+    def __init__(self, path, max_routes=10000, ttl=None, flush_hits=100):
+        """
+        Args:
+            path (string): path of the SQLite database file
+            max_routes (int): max number of routes kept in the cache
+            ttl (float, optional): number of seconds a route stays valid (routes never expire if not set)
+            flush_hits (int): number of hits whose last use time is kept in memory before it's written to the database
+        """
+        self.max_routes = max_routes
+        self.ttl = ttl
+        self.flush_hits = flush_hits
+        self.last_used = {} # last use time of the routes hit since the last flush, by key
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+        self.connection = sqlite3.connect(expanduser(path), timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS routes (
+                provider TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                points TEXT NOT NULL,
+                distance REAL NOT NULL,
+                duration REAL NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (provider, origin, destination)
+            )
+        ''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS routes_last_used ON routes (last_used)')
+        self.connection.commit()
+
+        self.n_routes = self.size() # number of cached routes, kept up to date as routes are stored, expire and are evicted
+
+    def get(self, provider, origin, destination):
+        """ Looks up a route, refreshing its position in the LRU order
+        Args:
+            provider (string): routing API that calculated the route
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+        Returns:
+            :obj:`dict`: route's points (list of latitude, longitude pairs), distance (in metres) and duration (in seconds),
+            or None if the route isn't cached
+        """
+
+        key = (provider, origin, destination)
+        row = self.connection.execute(
+            'SELECT points, distance, duration, created FROM routes WHERE provider = ? AND origin = ? AND destination = ?', key
+        ).fetchone()
+
+        if row == None:
+            self.stats['misses'] += 1
+            return None
+
+        points, distance, duration, created = row
+        now = time.time()
+
+        if self.ttl != None and now - created > self.ttl:
+            self.connection.execute('DELETE FROM routes WHERE provider = ? AND origin = ? AND destination = ?', key)
+            self.connection.commit()
+            self.n_routes -= 1
+            self.last_used.pop(key, None)
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+
+        self.last_used[key] = now
+        self.stats['hits'] += 1
+
+        if len(self.last_used) >= self.flush_hits:
+            self.flush()
+
+        return {'points': [tuple(point) for point in json.loads(points)], 'distance': distance, 'duration': duration}
+
+    def put(self, provider, origin, destination, points, distance, duration):
+        """ Stores a route, evicting the least recently used routes if the cache is full
+        Args:
+            provider (string): routing API that calculated the route
+            origin (string): coordinates of the route's origin
+            destination (string): coordinates of the route's destination
+            points (:obj:`list` of :obj:`tuple`): latitude, longitude pairs that describe the route
+            distance (float): route's distance (in metres)
+            duration (float): route's duration (in seconds)
+        """
+
+        now = time.time()
+        key = (provider, origin, destination)
+        self.last_used.pop(key, None)
+        replaced = self.connection.execute('SELECT 1 FROM routes WHERE provider = ? AND origin = ? AND destination = ?', key).fetchone()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            key + (json.dumps([list(point) for point in points]), distance, duration, now, now)
+        )
+
+        if replaced == None:
+            self.n_routes += 1
+
+        excess = self.n_routes - self.max_routes
+        if excess > 0:
+            self.flush(commit=False) # routes are evicted in the order they were last used, including the hits not written yet
+            evicted = self.connection.execute(
+                'DELETE FROM routes WHERE rowid IN (SELECT rowid FROM routes ORDER BY last_used LIMIT ?)', (excess,)
+            ).rowcount
+            self.stats['evictions'] += evicted
+            self.n_routes -= evicted
+
+        self.connection.commit()
+
+    def size(self):
+        """
+        Returns:
+            int: number of cached routes
+        """
+        return self.connection.execute('SELECT COUNT(*) FROM routes').fetchone()[0]
+
+    def report(self):
+        """ Formats the cache's stats to be printed at the end of a run
+        Returns:
+            string: hits, misses, hit rate, expired and evicted routes, and the cache's current size
+        """
+
+        stats = self.stats
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = 100 * stats['hits'] / lookups if lookups > 0 else 0
+
+        return (f"Persistent route cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hit rate), "
+            f"{stats['expired']} expired, {stats['evictions']} evicted, {self.size()} routes cached.")
+
+    def flush(self, commit=True):
+        """ Writes the last use time of the routes hit since the last flush, in a single transaction. Once committed, the routes 
+        are counted again, as other processes may have stored routes in the same database
+        Args:
+            commit (bool): if False, the transaction is left open, to be committed with the statements that follow
+        """
+
+        if self.last_used:
+            self.connection.executemany('UPDATE routes SET last_used = ? WHERE provider = ? AND origin = ? AND destination = ?',
+                [(last_used,) + key for key, last_used in self.last_used.items()])
+            self.last_used = {}
+
+        if commit:
+            self.connection.commit()
+            self.n_routes = self.size()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,201 @@
+import numpy as np
+import polyline
+
+from utils.bounds import EARTH_RADIUS, cumulative_distances
+
+def read_only(array):
+    array.setflags(write=False)
+    return array
+
+POLYLINE_PRECISIONS = (5, 6) # precisions tried when encoding coordinates as a polyline (Google uses 5, OpenStreetMap 6)
+
+def encode_coords(lats, lngs):
+    """ Encodes coordinates in a compact form: an encoded polyline, if that doesn't change them (routes returned by the APIs
+    have a limited precision), or the packed coordinates otherwise
+    Args:
+        lats (:obj:`numpy.ndarray`): latitudes (in degrees)
+        lngs (:obj:`numpy.ndarray`): longitudes (in degrees)
+    Returns:
+        :obj:`tuple`: the encoded coordinates (string or bytes) and the polyline's precision (None if packed)
+    """
+
+    for precision in (POLYLINE_PRECISIONS if len(lats) > 0 else ()):
+        factor = float(10 ** precision)
+
+        if np.array_equal(np.round(lats * factor) / factor, lats) and np.array_equal(np.round(lngs * factor) / factor, lngs):
+            return polyline.encode(list(zip(lats.tolist(), lngs.tolist())), precision), precision
+
+    return np.column_stack((lats, lngs)).tobytes(), None
+
+def decode_coords(encoded, precision):
+    """
+    Args:
+        encoded (string or bytes): coordinates encoded by `encode_coords`
+        precision (int): polyline's precision (None if packed)
+    Returns:
+        :obj:`tuple`: of :obj:`numpy.ndarray`: latitudes and longitudes (in degrees)
+    """
+
+    if precision == None:
+        coords = np.frombuffer(encoded, dtype=float).reshape(-1, 2)
+    else:
+        coords = np.array(polyline.decode(encoded, precision), dtype=float).reshape(-1, 2)
+
+    return coords[:, 0], coords[:, 1]
+
+def simplify(lats, lngs, tolerance):
+    """ Selects the points that describe a polyline within a certain tolerance (Douglas-Peucker algorithm), measuring distances
+    on a local equirectangular projection
+    Args:
+        lats (:obj:`numpy.ndarray`): latitudes of the polyline's points (in degrees)
+        lngs (:obj:`numpy.ndarray`): longitudes of the polyline's points (in degrees)
+        tolerance (float): max distance (in metres) between the polyline and its simplified version
+    Returns:
+        :obj:`numpy.ndarray`: of bool, True for the points that are kept
+    """
+
+    keep = np.ones(len(lats), dtype=bool)
+
+    if len(lats) < 3:
+        return keep
+
+    keep[1:-1] = False
+
+    radius = EARTH_RADIUS * 1000 # in metres
+    y = np.radians(lats) * radius
+    x = np.radians(lngs) * radius * np.cos(np.radians(np.mean(lats)))
+
+    stack = [(0, len(lats) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+
+        if last - first < 2:
+            continue
+
+        # distance of the points in between to the segment that joins both ends
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        length = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / length, 0, 1) if length > 0 else 0
+        distances = np.hypot(px - t * dx, py - t * dy)
+
+        farthest = int(np.argmax(distances))
+
+        if distances[farthest] > tolerance:
+            point = first + 1 + farthest
+            keep[point] = True
+            stack.append((first, point))
+            stack.append((point, last))
+
+    return keep
+
+class RouteGeometry(object):
+    """
+        Immutable geometry of a route: its points' coordinates, kept in compact form and only decoded when the route is written, 
+        and the distance travelled along the route up to each point, so the route can be retimed for any start and end time 
+        without walking (or decoding) its points. If the route is simplified, the points that are kept keep their distance along 
+        the original route, so they are timed as they would be without simplification
+    """
+
+    __slots__ = ('encoded', 'precision', 'cumulative')
+
+    def __init__(self, lats, lngs, tolerance=None):
+        """
+        Args:
+            lats (:obj:`numpy.ndarray`): latitudes of the route's points (in degrees)
+            lngs (:obj:`numpy.ndarray`): longitudes of the route's points (in degrees)
+            tolerance (float, optional): max distance (in metres) between the route and its simplified version (not simplified 
+            if not set)
+        """
+        lats = np.array(lats, dtype=float)
+        lngs = np.array(lngs, dtype=float)
+        cumulative = cumulative_distances(lats, lngs) * 1000 # in metres
+
+        if tolerance:
+            keep = simplify(lats, lngs, tolerance)
+            lats, lngs, cumulative = lats[keep], lngs[keep], cumulative[keep]
+
+        self.encoded, self.precision = encode_coords(lats, lngs)
+        self.cumulative = read_only(cumulative)
+
+    @classmethod
+    def from_points(cls, points, tolerance=None):
+        """
+        Args:
+            points (:obj:`list` of :obj:`tuple`): latitude, longitude pairs that describe the route
+            tolerance (float, optional): max distance (in metres) between the route and its simplified version
+        Returns:
+            :obj:`RouteGeometry`: the route's geometry
+        """
+        coords = np.array(points, dtype=float).reshape(-1, 2)
+        return cls(coords[:, 0], coords[:, 1], tolerance)
+
+    def __len__(self):
+        return len(self.cumulative)
+
+    def __getstate__(self):
+        return self.encoded, self.precision, self.cumulative
+
+    def __setstate__(self, state):
+        self.encoded, self.precision, cumulative = state
+        self.cumulative = read_only(cumulative)
+
+    @property
+    def nbytes(self):
+        """
+        Returns:
+            int: size of the encoded coordinates and the cumulative distances (in bytes)
+        """
+        return len(self.encoded) + self.cumulative.nbytes
+
+    def coords(self):
+        """ Decodes the route's coordinates
+        Returns:
+            :obj:`tuple`: of :obj:`numpy.ndarray`: latitudes and longitudes of the route's points (in degrees)
+        """
+        return decode_coords(self.encoded, self.precision)
+
+    def points(self):
+        """
+        Returns:
+            :obj:`list` of :obj:`tuple`: latitude, longitude pairs that describe the route
+        """
+        lats, lngs = self.coords()
+        return list(zip(lats.tolist(), lngs.tolist()))
+
+    def timestamps(self, start, end, speed):
+        """ Calculates the timestamps of the route's points, given a start time and a certain speed (in m/s). Steps between points
+        are travelled at the same speed (just an average), and the last point is set to the route's end time
+        Args:
+            start (int): route's start time (in seconds since the epoch)
+            end (int): route's end time (in seconds since the epoch)
+            speed (float): speed used in the route
+        Returns:
+            :obj:`numpy.ndarray`: timestamp of each point (in seconds since the epoch, as int64)
+        """
+
+        offsets = self.cumulative / speed if speed > 0 else np.zeros(len(self))
+        res = start + np.round(offsets * 1e6).astype(np.int64) // 1000000 # offsets are truncated to whole seconds
+        res[-1] = end # sets end time to last point
+
+        return res
+
+def freeze_route(route, tolerance=None):
+    """ Replaces a route's points by its immutable geometry, the form in which routes are kept in memory
+    Args:
+        route (:obj:`dict`): route's points, distance (in metres), duration (in seconds) and the backend that calculated it
+        tolerance (float, optional): max distance (in metres) between the route and its simplified version
+    Returns:
+        :obj:`dict`: route's geometry, distance, duration and backend
+    """
+
+    if 'geometry' in route:
+        return route
+
+    frozen = {key: value for key, value in route.items() if key != 'points'}
+    frozen['geometry'] = RouteGeometry.from_points(route['points'], tolerance)
+
+    return frozen
@@ -0,0 +1,40 @@
+import numpy as np
+
+class AliasSampler(object):
+    """
+        Draws indexes from a discrete distribution in constant time per index (Vose's alias method): each index is drawn with a
+        uniformly random index and a biased coin flip, which keeps the index or replaces it by its alias
+    """
+
+    def __init__(self, weights):
+        """
+        Args:
+            weights (:obj:`numpy.ndarray`): weight of each index (not necessarily normalised)
+        """
+        weights = np.asarray(weights, dtype=float)
+        scaled = weights * len(weights) / weights.sum()
+        self.prob = np.ones(len(weights))
+        self.alias = np.arange(len(weights))
+
+        small = [i for i in range(len(weights)) if scaled[i] < 1]
+        large = [i for i in range(len(weights)) if scaled[i] >= 1]
+
+        # pairs each index with less than its share of probability with one that has more, which fills the rest of its share
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self, rng, size):
+        """
+        Args:
+            rng (:obj:`numpy.random.Generator`): random generator
+            size (int or :obj:`tuple`): number (or shape) of indexes to draw
+        Returns:
+            :obj:`numpy.ndarray`: the drawn indexes
+        """
+        index = rng.integers(0, len(self.prob), size)
+        return np.where(rng.random(size) < self.prob[index], index, self.alias[index])
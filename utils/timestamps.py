@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+SECONDS_PER_DAY = 86400
+
+DATE_PREFIXES = {} # date part of the timestamps (`%Y-%m-%dT`), by number of days since the epoch
+TIMES_OF_DAY = [] # time of day part of the timestamps (`%H:%M:%SZ`), by second of the day, built when first needed
+
+def parse_timestamp(timestamp):
+    """
+    Args:
+        timestamp (string): UTC time in the `%Y-%m-%dT%H:%M:%SZ` format
+    Returns:
+        int: seconds since the epoch
+    """
+    return int(datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+
+def date_prefix(day):
+    """
+    Args:
+        day (int): number of days since the epoch
+    Returns:
+        string: the day's date, formatted as the start of a timestamp (`%Y-%m-%dT`)
+    """
+
+    if day not in DATE_PREFIXES:
+        DATE_PREFIXES[day] = datetime.fromtimestamp(day * SECONDS_PER_DAY, timezone.utc).strftime('%Y-%m-%dT')
+
+    return DATE_PREFIXES[day]
+
+def format_timestamps(times):
+    """ Formats timestamps in the `%Y-%m-%dT%H:%M:%SZ` format. Points are timed in order, so timestamps are formatted by runs of
+    the same day: the date part is formatted once per day, and the time of day part is looked up
+    Args:
+        times (:obj:`list` of int): seconds since the epoch
+    Returns:
+        :obj:`list` of string: the formatted timestamps
+    """
+
+    if not TIMES_OF_DAY:
+        TIMES_OF_DAY.extend(['%02d:%02d:%02dZ' % (second // 3600, second // 60 % 60, second % 60) for second in range(SECONDS_PER_DAY)])
+
+    times = np.asarray(times, dtype=np.int64)
+    days = times // SECONDS_PER_DAY
+    seconds = (times - days * SECONDS_PER_DAY).tolist()
+
+    # indexes where each run of timestamps of the same day starts and ends
+    bounds = (np.flatnonzero(np.diff(days)) + 1).tolist()
+    starts = [0] + bounds
+    ends = bounds + [len(seconds)]
+
+    res = []
+
+    for start, end in zip(starts, ends):
+        prefix = date_prefix(int(days[start]))
+        res += [prefix + TIMES_OF_DAY[second] for second in seconds[start:end]]
+
+    return res
@@ -0,0 +1,436 @@
+import gzip, json
+from abc import ABC, abstractmethod
+from os.path import isfile
+
+import numpy as np
+
+from utils.timestamps import format_timestamps
+
+OUTPUT_BUFFER_SIZE = 1 << 20 # in bytes
+
+GPX_DOCUMENT_START = '<?xml version="1.0" encoding="UTF-8"?>\n<!-- %s -->\n<gpx xmlns="http://www.topografix.com/GPX/1/1">\n'
+GPX_DOCUMENT_END = '</gpx>\n'
+GPX_TRACK_START = '\t<trk>\n'
+GPX_TRACK_NAME = '\t\t<name>%s</name>\n'
+GPX_TRACK_END = '\t</trk>\n'
+GPX_SEGMENT_START = '\t\t<trkseg>\n'
+GPX_SEGMENT_END = '\t\t</trkseg>\n\n'
+GPX_POINT = '\t\t\t<trkpt lat="%r" lon="%r">\n\t\t\t\t<time>%s</time>\n\t\t\t</trkpt>\n'
+
+POINTS_PER_WRITE = 1000 # points formatted and written at once, bounds the memory used to write long segments
+
+class TrackWriter(ABC):
+    """
+        Base of the track writers, which write one or more tracks (a day's routes each) to a file, segment by segment. The 
+        document, and each track, are only started once their first segment is written, so tracks without segments are left out 
+        and files without any segment are left empty. Tracks started with a name are listed in `index`, with their byte range 
+        in the file, so a single day can be read without parsing the whole file. Writers implement `render_segment`, 
+        `add_segment`, `copy_track`, `end_track` and `close`
+    """
+
+    extension = None
+    binary = False # True if the writer writes to a binary file
+
+    @classmethod
+    def open(cls, path):
+        """
+        Args:
+            path (string): path of the output file
+        Returns:
+            file object the writer writes to
+        """
+        return open(path, 'w', buffering=OUTPUT_BUFFER_SIZE)
+
+    @classmethod
+    def read_tracks(cls, path):
+        """ Reads the named tracks of a file written by the writer, as they were written, using its index
+        Args:
+            path (string): path of the file
+        Returns:
+            :obj:`dict`: each track (as taken by `copy_track`) by name, empty if the file or its index don't exist
+        """
+
+        if not isfile(path) or not isfile(f"{path}.index.json"):
+            return {}
+
+        with open(f"{path}.index.json", 'r') as index_file:
+            index = json.load(index_file)
+
+        with open(path, 'rb') as track_file:
+            data = track_file.read()
+
+        return {entry['name']: cls.track_data(data[entry['offset']:entry['offset'] + entry['length']]) for entry in index}
+
+    @classmethod
+    def track_data(cls, data):
+        return data.decode()
+
+    def __init__(self, file, name):
+        """
+        Args:
+            file (:obj:`io.TextIOBase`): file the tracks are written to
+            name (string): name of the document (the day's date, or the name of the group of days)
+        """
+        self.file = file
+        self.name = name
+        self.started = False
+        self.track = None
+        self.in_track = False
+        self.nbytes = 0
+        self.index = []
+
+    def write(self, text):
+        self.file.write(text)
+        self.nbytes += len(text) if text.isascii() else len(text.encode())
+
+    def offset(self):
+        """
+        Returns:
+            int: position of the next byte written in the file
+        """
+        return self.nbytes
+
+    def start_track(self, name=None):
+        """ Ends the current track, so the following segments are written in a new one
+        Args:
+            name (string, optional): name of the new track (the day's date)
+        """
+        self.end_track()
+        self.track = name
+
+    def open_track(self):
+        self.in_track = True
+        if self.track != None:
+            self.index.append({'name': self.track, 'offset': self.offset()})
+
+    def close_track(self):
+        self.in_track = False
+        if self.track != None:
+            self.index[-1]['length'] = self.offset() - self.index[-1]['offset']
+
+    @classmethod
+    @abstractmethod
+    def render_segment(cls, lats, lngs, times, track=None):
+        """ Formats the points of a route, the CPU bound part of writing it, which doesn't depend on the writer's state (so it 
+        can be done in another process)
+        Args:
+            lats (:obj:`list` of float): latitudes of the route's points
+            lngs (:obj:`list` of float): longitudes of the route's points
+            times (:obj:`list` of int): timestamps of the route's points (in seconds since the epoch)
+            track (string, optional): name of the route's track
+        Yields:
+            the formatted route, in pieces of up to `POINTS_PER_WRITE` points
+        """
+
+    def segment(self, lats, lngs, times):
+        """ Writes the points of a route
+        Args:
+            lats (:obj:`list` of float): latitudes of the route's points
+            lngs (:obj:`list` of float): longitudes of the route's points
+            times (:obj:`list` of int): timestamps of the route's points (in seconds since the epoch)
+        """
+
+        if len(times) > 0:
+            self.add_segment(self.render_segment(lats, lngs, times, self.track))
+
+    @abstractmethod
+    def add_segment(self, pieces):
+        """ Writes a route formatted by `render_segment`, starting the document and the current track if they weren't yet
+        Args:
+            pieces (iterable): the formatted route
+        """
+
+    @abstractmethod
+    def copy_track(self, data):
+        """ Writes a track read from a previous file (see `read_tracks`) as the current track, as it was written
+        Args:
+            data: the track, as returned by `read_tracks`
+        """
+
+    @abstractmethod
+    def end_track(self):
+        """ Ends the current track, if it was started
+        """
+
+    @abstractmethod
+    def close(self):
+        """ Ends the document, if it was started
+        """
+
+class GPXWriter(TrackWriter):
+    """
+        Writes tracks in the gpx format, a <trk> per track, to a (buffered) file
+    """
+
+    extension = '.gpx'
+
+    @classmethod
+    def render_segment(cls, lats, lngs, times, track=None):
+        for i in range(0, len(times), POINTS_PER_WRITE):
+            points = zip(lats[i:i + POINTS_PER_WRITE], lngs[i:i + POINTS_PER_WRITE], format_timestamps(times[i:i + POINTS_PER_WRITE]))
+            yield ''.join([GPX_POINT % point for point in points])
+
+    def add_segment(self, pieces):
+        """ Writes a <trkseg> with the points of a route
+        Args:
+            pieces (iterable): the route's points formatted by `render_segment`
+        """
+
+        if not self.started:
+            self.write(GPX_DOCUMENT_START % self.name)
+            self.started = True
+
+        if not self.in_track:
+            self.open_track()
+            self.write(GPX_TRACK_START)
+            if self.track != None:
+                self.write(GPX_TRACK_NAME % self.track)
+
+        self.write(GPX_SEGMENT_START)
+
+        for piece in pieces:
+            self.write(piece)
+
+        self.write(GPX_SEGMENT_END)
+
+    def copy_track(self, data):
+        if not self.started:
+            self.write(GPX_DOCUMENT_START % self.name)
+            self.started = True
+
+        self.open_track()
+        self.write_track_data(data)
+        self.close_track()
+
+    def write_track_data(self, data):
+        self.write(data)
+
+    def end_track(self):
+        if self.in_track:
+            self.write(GPX_TRACK_END)
+            self.close_track()
+
+    def close(self):
+        self.end_track()
+
+        if self.started:
+            self.write(GPX_DOCUMENT_END)
+
+class GzipGPXWriter(GPXWriter):
+    """
+        Writes tracks in the gpx format, streamed through a gzip compressor. Named tracks are compressed as separate gzip members
+        (a gzip file can hold several), so the byte range of a track in the index can be decompressed on its own
+    """
+
+    extension = '.gpx.gz'
+    binary = True
+
+    @classmethod
+    def open(cls, path):
+        return open(path, 'wb', buffering=OUTPUT_BUFFER_SIZE)
+
+    def __init__(self, file, name):
+        """
+        Args:
+            file (:obj:`io.BufferedIOBase`): binary file the compressed tracks are written to
+            name (string): name of the document (the day's date, or the name of the group of days)
+        """
+        GPXWriter.__init__(self, file, name)
+        self.member = None
+
+    def write(self, text):
+        if self.member == None:
+            self.member = gzip.GzipFile(fileobj=self.file, mode='wb', compresslevel=6, mtime=0)
+
+        data = text.encode()
+        self.member.write(data)
+        self.nbytes += len(data)
+
+    def end_member(self):
+        if self.member != None:
+            self.member.close() # writes the member's trailer, leaving the file open
+            self.member = None
+
+    def offset(self):
+        return self.file.tell()
+
+    @classmethod
+    def track_data(cls, data):
+        return data # the track's gzip member, copied without decompressing it
+
+    def write_track_data(self, data):
+        self.end_member()
+        self.file.write(data)
+
+    def open_track(self):
+        if self.track != None:
+            self.end_member()
+        GPXWriter.open_track(self)
+
+    def close_track(self):
+        if self.track != None:
+            self.end_member()
+        GPXWriter.close_track(self)
+
+    def close(self):
+        GPXWriter.close(self)
+        self.end_member()
+
+class GeoJSONWriter(TrackWriter):
+    """
+        Writes tracks as a GeoJSON FeatureCollection, with a LineString feature (and its points' timestamps) per segment. The 
+        features of named tracks also hold the track's name as their `day`
+    """
+
+    extension = '.geojson'
+
+    @classmethod
+    def render_segment(cls, lats, lngs, times, track=None):
+        yield '{"type":"Feature","geometry":{"type":"LineString","coordinates":['
+
+        for i in range(0, len(times), POINTS_PER_WRITE):
+            points = zip(lngs[i:i + POINTS_PER_WRITE], lats[i:i + POINTS_PER_WRITE])
+            yield (',' if i > 0 else '') + ','.join(['[%r,%r]' % point for point in points])
+
+        day = '"day":%s,' % json.dumps(track) if track != None else ''
+        yield ']},"properties":{%s"times":%s}}' % (day, json.dumps(format_timestamps(times), separators=(',', ':')))
+
+    def add_segment(self, pieces):
+        """ Writes a LineString feature with the points of a route
+        Args:
+            pieces (iterable): the feature formatted by `render_segment`
+        """
+
+        if not self.started:
+            self.write('{"type":"FeatureCollection","name":%s,"features":[\n' % json.dumps(self.name))
+            self.started = True
+        else:
+            self.write(',\n')
+
+        if not self.in_track:
+            self.open_track()
+
+        for piece in pieces:
+            self.write(piece)
+
+    def copy_track(self, data):
+        if not self.started:
+            self.write('{"type":"FeatureCollection","name":%s,"features":[\n' % json.dumps(self.name))
+            self.started = True
+        else:
+            self.write(',\n')
+
+        self.open_track()
+        self.write(data)
+        self.close_track()
+
+    def end_track(self):
+        if self.in_track:
+            self.close_track()
+
+    def close(self):
+        self.end_track()
+
+        if self.started:
+            self.write('\n]}\n')
+
+class NPZWriter(TrackWriter):
+    """
+        Writes tracks in a binary columnar format: a compressed numpy .npz archive with the points' latitudes, longitudes and 
+        timestamps (seconds since the epoch), and the index of the first point of each segment. The archive can't be streamed 
+        (it's written once closed), and instead of a byte range index it holds the names of the named tracks and the index of 
+        their first point
+    """
+
+    extension = '.npz'
+    binary = True
+
+    @classmethod
+    def open(cls, path):
+        return open(path, 'wb')
+
+    @classmethod
+    def read_tracks(cls, path):
+        if not isfile(path):
+            return {}
+
+        with np.load(path) as archive:
+            arrays = {key: archive[key] for key in archive.files}
+
+        if 'name' not in arrays:
+            return {}
+
+        res = {}
+        ends = arrays['track'].tolist()[1:] + [len(arrays['lat'])]
+
+        for name, start, end in zip(arrays['name'].tolist(), arrays['track'].tolist(), ends):
+            segments = arrays['segment'][(arrays['segment'] >= start) & (arrays['segment'] < end)].tolist() + [end]
+            res[name] = [(arrays['lat'][first:last], arrays['lng'][first:last], arrays['time'][first:last]) for first, last in zip(segments, segments[1:])]
+
+        return res
+
+    def __init__(self, file, name):
+        """
+        Args:
+            file (:obj:`io.BufferedIOBase`): binary file the tracks are written to
+            name (string): name of the document (the day's date, or the name of the group of days)
+        """
+        TrackWriter.__init__(self, file, name)
+        self.lats = []
+        self.lngs = []
+        self.times = []
+        self.n_points = 0
+        self.tracks = []
+        self.track_starts = []
+
+    def open_track(self):
+        self.in_track = True
+        if self.track != None:
+            self.tracks.append(self.track)
+            self.track_starts.append(self.n_points)
+
+    @classmethod
+    def render_segment(cls, lats, lngs, times, track=None):
+        yield np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float), np.asarray(times, dtype=np.int64)
+
+    def add_segment(self, pieces):
+        """ Adds the points of a route to the archive
+        Args:
+            pieces (iterable): the route's latitudes, longitudes and timestamps, as arrays, formatted by `render_segment`
+        """
+
+        if not self.in_track:
+            self.open_track()
+
+        for lats, lngs, times in pieces:
+            self.lats.append(lats)
+            self.lngs.append(lngs)
+            self.times.append(times)
+            self.n_points += len(times)
+
+    def copy_track(self, data):
+        self.open_track()
+        self.add_segment(data)
+        self.end_track()
+
+    def end_track(self):
+        self.in_track = False
+
+    def close(self):
+        """ Writes the archive
+        """
+
+        lengths = [len(lats) for lats in self.lats]
+        concatenate = lambda arrays, dtype: np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+        tracks = {'track': np.array(self.track_starts, dtype=np.int64), 'name': np.array(self.tracks)} if self.tracks else {}
+
+        np.savez_compressed(
+            self.file,
+            lat=concatenate(self.lats, float),
+            lng=concatenate(self.lngs, float),
+            time=concatenate(self.times, np.int64),
+            segment=np.cumsum([0] + lengths[:-1]).astype(np.int64) if lengths else np.empty(0, dtype=np.int64),
+            **tracks
+        )
+
+TRACK_WRITERS = {'gpx': GPXWriter, 'gpx.gz': GzipGPXWriter, 'geojson': GeoJSONWriter, 'npz': NPZWriter}